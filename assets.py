@@ -0,0 +1,77 @@
+import hashlib
+import os
+
+from PIL import Image
+
+
+
+
+# Resized (and rotated) images are cached on disk so later launches skip the
+# decode + resize; cached files are keyed by a hash of the source file and the
+# target size, so editing an image or changing screens makes a new entry
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".asset_cache")
+
+_source_hashes = {}
+
+
+
+
+def source_hash(path):
+    """
+    Short hash of a file's contents, remembered for the rest of the run
+    """
+    if path not in _source_hashes:
+        with open(path, "rb") as source:
+            _source_hashes[path] = hashlib.sha1(source.read()).hexdigest()[:16]
+    return _source_hashes[path]
+
+
+
+
+def load_image(path, size, angle = 0, cache_dir = CACHE_DIR):
+    """
+    Image at path resized to size (width, height), then rotated by angle degrees
+    Rotation expands the image and fills the corners white, like the menu mochi
+    """
+    size = (int(size[0]), int(size[1]))
+    name = os.path.splitext(os.path.basename(path))[0]
+    cached_path = os.path.join(cache_dir, "%s-%s-%dx%d-%d.raw" % (name, source_hash(path), size[0], size[1], angle))
+    try:
+        return _read_raw(cached_path)
+    except (OSError, ValueError):
+        pass
+
+
+    # Cache miss (or a broken file): build it and save for next time
+    image = Image.open(path).resize(size)
+    if angle:
+        image = image.rotate(angle, fillcolor = "white", expand = 1)
+    try:
+        os.makedirs(cache_dir, exist_ok = True)
+        _write_raw(cached_path, image)
+    except OSError:
+        pass # A read-only install just runs uncached
+    return image
+
+
+
+
+def _write_raw(path, image):
+    """
+    Uncompressed pixels behind a one line "mode width height" header
+    Bigger on disk than PNG, but reading it back is a plain copy with no decoding
+    """
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as cached:
+        cached.write(("%s %d %d\n" % (image.mode, image.width, image.height)).encode())
+        cached.write(image.tobytes())
+    os.replace(temp_path, path) # Never leave a half written file under the real name
+
+
+
+
+def _read_raw(path):
+    with open(path, "rb") as cached:
+        mode, width, height = cached.readline().decode().split()
+        return Image.frombytes(mode, (int(width), int(height)), cached.read())
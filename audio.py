@@ -0,0 +1,152 @@
+import io
+import queue
+import sys
+import threading
+import wave
+
+
+
+
+# Sound effects decoded into memory once and played from a single worker thread
+# Backends, best first: winsound (Windows, stdlib), simpleaudio, playsound, and a
+# null backend for headless runs
+# Only winsound and simpleaudio play from memory; playsound reopens and decodes
+# the file on every play, so on Linux and macOS install simpleaudio to avoid that
+
+
+
+
+class Clip(object):
+    """
+    A decoded WAV file: raw PCM frames plus what's needed to play them
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as source:
+            self.data = source.read() # Whole file, for backends that want WAV bytes
+        with wave.open(io.BytesIO(self.data)) as decoded:
+            self.channels = decoded.getnchannels()
+            self.sample_width = decoded.getsampwidth()
+            self.frame_rate = decoded.getframerate()
+            self.frames = decoded.readframes(decoded.getnframes())
+
+
+
+
+class NullBackend(object):
+    """
+    Plays nothing; for headless runs and machines without a sound backend
+    """
+    def play(self, clip):
+        pass
+
+
+
+
+class WinsoundBackend(object):
+    def __init__(self):
+        import winsound
+        self.winsound = winsound
+
+    def play(self, clip):
+        self.winsound.PlaySound(clip.data, self.winsound.SND_MEMORY)
+
+
+
+
+class SimpleaudioBackend(object):
+    def __init__(self):
+        import simpleaudio
+        self.simpleaudio = simpleaudio
+
+    def play(self, clip):
+        self.simpleaudio.play_buffer(clip.frames, clip.channels, clip.sample_width, clip.frame_rate)
+
+
+
+
+class PlaysoundBackend(object):
+    def __init__(self):
+        from playsound import playsound
+        self.playsound = playsound
+
+    def play(self, clip):
+        self.playsound(clip.path)
+
+
+
+
+def default_backend():
+    """
+    First backend that can be imported on this machine
+    """
+    backends = [SimpleaudioBackend, PlaysoundBackend]
+    if sys.platform == "win32":
+        backends.insert(0, WinsoundBackend)
+    for backend in backends:
+        try:
+            return backend()
+        except ImportError:
+            pass
+    return NullBackend()
+
+
+
+
+class AudioService(object):
+    def __init__(self, backend = None, queue_size = 4):
+        """
+        Holds decoded clips and one worker that plays them in order
+        Requests past queue_size are dropped rather than piling up
+        """
+        self.backend = backend
+        self.clips = {}
+        self.requests = queue.Queue(maxsize = queue_size)
+        self.worker = None
+
+
+
+
+    def load(self, name, path):
+        """
+        Decode a WAV file now so play never touches the disk
+        """
+        self.clips[name] = Clip(path)
+
+
+
+
+    def start(self):
+        """
+        Pick the backend and start the worker, so the first play doesn't pay for it
+        """
+        if self.worker is None:
+            if self.backend is None:
+                self.backend = default_backend()
+            self.worker = threading.Thread(target = self._run, daemon = True)
+            self.worker.start()
+
+
+
+
+    def play(self, name):
+        """
+        Queue a loaded clip; returns right away, False if the queue was full
+        """
+        self.start()
+        try:
+            self.requests.put_nowait(self.clips[name])
+            return True
+        except queue.Full:
+            return False
+
+
+
+
+    def _run(self):
+        while True:
+            clip = self.requests.get()
+            try:
+                self.backend.play(clip)
+            except Exception as error: # A broken sound device shouldn't kill the worker
+                print("Couldn't play %s: %s" % (clip.path, error))
@@ -0,0 +1,683 @@
+import contextlib
+import json
+import os
+import random as r
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from types import SimpleNamespace
+
+import perf
+from engine import PRESETS, Board, load_numpy, make_board, sample_mines
+from generator import BoardPool, generate_no_guess
+from replay import REVEAL, Recorder, Replay
+from solver import Solver
+
+
+
+
+# Headless benchmarks for the engine hot paths
+# python3 bench.py
+
+
+
+
+def bench_reveal(width, height, mine_number, seed = 0):
+    """
+    Time one flood fill reveal from the middle of a big, mostly open board
+    """
+    r.seed(seed)
+    board = Board(width, height, mine_number)
+    board.place_mines(height // 2 * width + width // 2)
+
+    start = time.perf_counter()
+    cleared = board.reveal(height // 2 * width + width // 2)
+    elapsed = time.perf_counter() - start
+
+    print("reveal %dx%d, %d mines: %d tiles in %.3f s (%.0f tiles/s)" % (
+        width, height, mine_number, len(cleared), elapsed, len(cleared) / elapsed))
+    return elapsed
+
+
+
+
+def bench_engines(width, height, mine_number, games = 1, seed = 0):
+    """
+    Time whole headless games (place mines, reveal from the first click) on each backend
+    """
+    for engine in ["array", "bitboard"]:
+        r.seed(seed)
+        start = time.perf_counter()
+        for game in range(games):
+            board = make_board(width, height, mine_number, engine)
+            board.place_mines(height // 2 * width + width // 2)
+            if engine == "bitboard":
+                board.reveal_bits(height // 2 * width + width // 2)
+            else:
+                board.reveal(height // 2 * width + width // 2)
+        elapsed = time.perf_counter() - start
+
+        print("engine %s %dx%d, %d mines: %.2f ms/game" % (
+            engine, width, height, mine_number, elapsed / games * 1000))
+
+
+
+
+def bench_solver(width, height, mine_number, games = 1000, engine = "array", seed = 0):
+    """
+    Let the solver play whole games from a random first click, without guessing
+    Throughput is solved boards per second; boards it gets stuck on still count toward the time
+    """
+    r.seed(seed)
+    solved = moves = 0
+    start = time.perf_counter()
+    for game in range(games):
+        board = make_board(width, height, mine_number, engine)
+        solver = Solver(board)
+        solved += solver.solve(r.randrange(width * height))
+        moves += solver.moves
+    elapsed = time.perf_counter() - start
+
+    print("solver %s %dx%d, %d mines: %d/%d solved, %.1f solved boards/s (%.1f attempted), %.3f ms/move" % (
+        engine, width, height, mine_number, solved, games, solved / elapsed, games / elapsed, elapsed / max(moves, 1) * 1000))
+
+
+
+
+def bench_no_guess(games = 20, seed = 0):
+    """
+    Time filling the no-guess pool, how often it has a board for a random first
+    click, and making one on the spot when it doesn't
+    """
+    r.seed(seed)
+    pool = BoardPool()
+    start = time.perf_counter()
+    slowest = 0
+    for step in pool.fill():
+        slowest = max(slowest, time.perf_counter() - start)
+        start = time.perf_counter()
+    print("no-guess pool: slowest step %.1f ms" % (slowest * 1000))
+
+    for name, (width, height, mine_number) in PRESETS.items():
+        hits = 0
+        for game in range(games):
+            hits += pool.take(name, r.randrange(width * height)) is not None
+            for step in pool.fill(): # Topped up between games, like the menu does
+                pass
+        start = time.perf_counter()
+        for game in range(games):
+            generate_no_guess(width, height, mine_number, r.randrange(width * height))
+        elapsed = time.perf_counter() - start
+        print("no-guess %s: %d/%d first clicks from the pool, %.1f ms to make one otherwise" % (
+            name, hits, games, elapsed / games * 1000))
+
+
+
+
+def bench_replay(width, height, mine_number, games = 1000, seed = 0):
+    """
+    Record solver-played games, then time replaying them and check each comes out the same
+    """
+    r.seed(seed)
+    logs = []
+    outcomes = []
+    for game in range(games):
+        board = make_board(width, height, mine_number, seed = r.getrandbits(32))
+        first_index = r.randrange(board.size)
+        board.place_mines(first_index)
+        recorder = Recorder(width, height, mine_number, board.seed, first_index)
+        reveal = board.reveal
+        def recorded_reveal(index, reveal = reveal, recorder = recorder):
+            recorder.record(index, REVEAL)
+            return reveal(index)
+        board.reveal = recorded_reveal
+        Solver(board).play(first_index)
+        logs.append(bytes(recorder.data))
+        outcomes.append((board.is_won(), board.lost, bytes(board.revealed)))
+
+    start = time.perf_counter()
+    boards = [Replay(data).play() for data in logs]
+    elapsed = time.perf_counter() - start
+    for board, outcome in zip(boards, outcomes):
+        assert (board.is_won(), board.lost, bytes(board.revealed)) == outcome, "replay diverged"
+
+    print("replay %dx%d, %d mines: %.0f replays/s, %.1f bytes/game" % (
+        width, height, mine_number, games / elapsed, sum(len(data) for data in logs) / games))
+
+
+
+
+def bench_perf_hooks(calls = 1000000):
+    """
+    Cost of a start/stop hook pair, disabled and enabled
+    """
+    for on in [False, True]:
+        perf.enabled = on # Not perf.enable, which would also export at exit
+        start = time.perf_counter()
+        for call in range(calls):
+            perf.stop("bench", perf.start())
+        elapsed = time.perf_counter() - start
+        print("perf hook %s: %.0f ns/pair" % ("enabled" if on else "disabled", elapsed / calls * 1e9))
+    perf.enabled = False
+    perf.histograms.pop("bench", None)
+
+
+
+
+def bench_place_mines(width, height, density, seed = 0):
+    """
+    Time mine placement at a given fraction of the board
+    """
+    r.seed(seed)
+    mine_number = int(width * height * density)
+    board = Board(width, height, mine_number)
+
+    start = time.perf_counter()
+    board.place_mines(height // 2 * width + width // 2)
+    elapsed = time.perf_counter() - start
+
+    print("place %dx%d, %d mines (%.0f%%): %.3f s" % (
+        width, height, mine_number, density * 100, elapsed))
+    return elapsed
+
+
+
+
+def bench_generate(width, height, mine_number, use_numpy, seed = 0):
+    """
+    Time building a board and placing its mines with either neighbour counter
+    Sampling is reported separately; it goes through random on both paths
+    """
+    r.seed(seed)
+    first_index = height // 2 * width + width // 2
+    times = [time.perf_counter()]
+    board = Board(width, height, mine_number, use_numpy = use_numpy)
+    times.append(time.perf_counter())
+    mine_indexes = sample_mines(width, height, mine_number, first_index, board.safe_radius)
+    times.append(time.perf_counter())
+    board.place_mines(first_index, mine_indexes)
+    times.append(time.perf_counter())
+    elapsed = times[-1] - times[0]
+
+    print("generate %dx%d, %d mines (%s): %.3f s (%.3f s board, %.3f s sampling, %.3f s counting)" % (
+        width, height, mine_number, "numpy" if use_numpy else "python", elapsed,
+        times[1] - times[0], times[2] - times[1], times[3] - times[2]))
+    return elapsed
+
+
+
+
+class CountingCanvas(object):
+    """
+    Stands in for tk.Canvas; hands out item ids and counts every call by method
+    """
+    def __init__(self, *args, **kwargs):
+        self.item_count = 0
+        self.calls = Counter()
+
+    def _create(self, *args, **kwargs):
+        self.calls["create"] += 1
+        self.item_count += 1
+        return self.item_count
+
+    create_rectangle = create_text = create_polygon = create_arc = create_oval = create_image = _create
+
+    def find_all(self):
+        self.calls["find_all"] += 1
+        return range(1, self.item_count + 1)
+
+    def __getattr__(self, name):
+        # itemconfig, coords, delete, dtag, tag_raise, ...: counted, otherwise ignored
+        def call(*args, **kwargs):
+            self.calls[name] += 1
+        return call
+
+
+
+
+class FakeWidget(object):
+    """
+    Stands in for tk.Frame, tk.Button and tk.PhotoImage; takes any call and does nothing
+    """
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+
+
+class FakeRoot(FakeWidget):
+    """
+    Stands in for tk.Tk; after never fires, so scheduler tasks only run when stepped
+    """
+    def after(self, *args):
+        return "after"
+
+    def winfo_screenwidth(self):
+        return 1920
+
+    def winfo_screenheight(self):
+        return 1080
+
+
+
+
+class FrameClock(object):
+    """
+    Stands in for the time module in main; monotonic moves one 60 fps frame per
+    call, so time based animations take the same steps on every run
+    """
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        self.now += 1 / 60
+        return self.now
+
+    def time(self):
+        return self.now
+
+
+
+
+@contextlib.contextmanager
+def headless_main():
+    """
+    main with a CountingCanvas for tk.Canvas, fakes for the other widgets and
+    ImageTk, and a frame clock, so Minesweeper and Tile run with no display
+    """
+    import main
+    import render
+    from PIL import ImageTk
+
+    fake_tk = SimpleNamespace(Frame = FakeWidget, Button = FakeWidget, PhotoImage = FakeWidget,
+        Canvas = CountingCanvas, GROOVE = "groove")
+    saved = main.tk, getattr(main, "root", None), main.time, ImageTk.PhotoImage
+    main.tk, main.root, main.time, ImageTk.PhotoImage = fake_tk, FakeRoot(), FrameClock(), FakeWidget
+    render.tile_sprites.cache_clear()
+    try:
+        yield main
+    finally:
+        main.tk, main.root, main.time, ImageTk.PhotoImage = saved
+        render.tile_sprites.cache_clear()
+
+
+
+
+# Scripted games per size for bench_suite: name, width, height, mines
+SUITE_SIZES = [(name,) + size for name, size in PRESETS.items()] + [
+    ("100x100", 100, 100, 2000),
+    ("300x300", 300, 300, 18000),
+]
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baselines.json")
+# With timing on, times may grow this much (plus 1 ms) before counting as a regression
+# Stored times come from whichever machine last ran --update, so only compare on that one
+TIME_TOLERANCE = 1.5
+
+
+
+
+def run_tasks(scheduler, handle = None):
+    """
+    Step scheduler tasks (one, or all of them) to the end without waiting on their delays
+    """
+    while handle in scheduler.tasks if handle else scheduler.tasks:
+        for task_handle, task in list(scheduler.tasks.items()):
+            if handle and task_handle != handle:
+                continue
+            try:
+                next(task[1])
+            except StopIteration:
+                scheduler.tasks.pop(task_handle, None)
+
+
+
+
+def script_game(main, width, height, mine_number, difficulty = None):
+    """
+    Play one scripted game on a headless Minesweeper with Tile views; returns
+    {operation: (seconds, canvas calls)}
+    """
+    from audio import NullBackend
+
+    game = main.Minesweeper(main.root, 800)
+    game.audio.backend = NullBackend()
+    game.save_replays = False
+    game.auto_setup = False # Every suite size is measured with Tile views
+    canvas = game.canvas
+    results = {}
+
+    def measure(operation, action):
+        calls = sum(canvas.calls.values())
+        start = time.perf_counter()
+        action()
+        results[operation] = (time.perf_counter() - start, sum(canvas.calls.values()) - calls)
+
+    def click(index, button):
+        row, col = divmod(index, width)
+        game._on_click(SimpleNamespace(x = (col + 0.5) * game.tile_length, y = (row + 0.5) * game.tile_length, num = button))
+
+    def toggle_flags():
+        mines = [index for index in range(game.board.size) if game.board.mines[index]]
+        for button_presses in range(3): # Flag, unflag, then leave them flagged for the end screen
+            for index in mines:
+                click(index, 3)
+
+    def reveal_all():
+        board = game.board
+        for index in range(board.size):
+            if not board.revealed[index] and not board.mines[index]:
+                click(index, 1)
+
+    measure("build", lambda: game._start_game(width, height, mine_number, difficulty))
+    measure("first_click", lambda: click(height // 2 * width + width // 2, 1))
+    measure("tag_mines", lambda: run_tasks(game.scheduler, game.mine_task))
+    measure("flag_toggle", toggle_flags)
+    measure("reveal", reveal_all)
+    assert game.phase == "over", "scripted game didn't end in a win"
+    measure("end_animation", lambda: run_tasks(game.scheduler))
+    game._start_menu(None)
+    measure("rebuild", lambda: game._start_game(width, height, mine_number, difficulty)) # Same size again, from the tile pool
+    return results
+
+
+
+
+def bench_suite(update = False, timing = False, seed = 0):
+    """
+    Time and count canvas calls for each step of a scripted game at every suite size,
+    then compare against bench_baselines.json; update rewrites the baselines instead
+    Any step making more canvas calls than its baseline fails; with timing, so does
+    one running much slower
+    """
+    results = {}
+    load_numpy() # One-off import cost shouldn't land on whichever size first needs it
+    with headless_main() as main:
+        for name, width, height, mine_number in SUITE_SIZES:
+            r.seed(seed)
+            for operation, (seconds, calls) in script_game(main, width, height, mine_number, name if name in PRESETS else None).items():
+                results["%s %s" % (name, operation)] = {"ms": round(seconds * 1000, 3), "calls": calls}
+                print("suite %-8s %-13s %10.2f ms %9d canvas calls" % (name, operation, seconds * 1000, calls))
+
+    if update:
+        with open(BASELINE_PATH, "w") as baseline_file:
+            json.dump(results, baseline_file, indent = 2)
+        print("suite: baselines written to %s" % BASELINE_PATH)
+        return
+
+    with open(BASELINE_PATH) as baseline_file:
+        baselines = json.load(baseline_file)
+    failures = []
+    for key, result in results.items():
+        baseline = baselines.get(key)
+        if baseline is None:
+            print("suite %s: no baseline" % key)
+            continue
+        if result["calls"] > baseline["calls"]:
+            failures.append("%s: %d canvas calls, baseline %d" % (key, result["calls"], baseline["calls"]))
+        if timing and result["ms"] > baseline["ms"] * TIME_TOLERANCE + 1:
+            failures.append("%s: %.2f ms, baseline %.2f ms" % (key, result["ms"], baseline["ms"]))
+    if failures:
+        raise SystemExit("Regressions against %s:\n  %s" % (BASELINE_PATH, "\n  ".join(failures)))
+    print("suite: no regressions against %s" % BASELINE_PATH)
+
+
+
+
+def bench_memory(width, height):
+    """
+    Bytes per tile and build time for the engine Board and the grid of Tile views
+    """
+    from main import Tile
+
+    canvas = CountingCanvas()
+    for name, build in [
+            ("board", lambda: Board(width, height, 0)),
+            ("tiles", lambda: [[Tile(canvas, 10, row, col) for col in range(width)] for row in range(height)])]:
+        Board(width, height, 0) # Neighbour table is cached, so keep it out of the measurement
+        start = time.perf_counter()
+        build()
+        elapsed = time.perf_counter() - start
+
+        # Tracing slows allocation down a lot, so memory is measured on a second build
+        tracemalloc.start()
+        built = build()
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del built
+
+        print("memory %dx%d %s: %.1f bytes/tile, built in %.3f s" % (
+            width, height, name, memory / (width * height), elapsed))
+
+
+
+
+def bench_chord(width, height, mine_number, seed = 0):
+    """
+    Clear a board (mines pre-flagged) by chording every number, against clicking
+    the same tiles one at a time; both draw through Tile views, one pass per click
+    """
+    from main import Minesweeper, Tile
+
+    Tile.sprites = dict.fromkeys(list(range(1, 9)) + ["flag"]) # Real sprites need a Tk root
+
+    for mode in ["chord", "single"]:
+        board = make_board(width, height, mine_number, seed = seed)
+        first_index = height // 2 * width + width // 2
+        board.place_mines(first_index)
+        for index in range(board.size):
+            if board.mines[index]:
+                board.toggle_flag(index)
+        canvas = CountingCanvas()
+        view = SimpleNamespace(board = board, board_tile_width = width,
+            minefield = [[Tile(canvas, 10, row, col) for col in range(width)] for row in range(height)])
+        Minesweeper._draw_cleared(view, board.reveal(first_index))
+
+        clicks = 0
+        elapsed = 0
+        while not board.is_won():
+            for index in [index for index in range(board.size) if board.revealed[index] and board.mines_near[index]]:
+                covered = [neighbor for neighbor in board.get_neighbors(index)
+                    if not board.revealed[neighbor] and not board.flagged[neighbor]]
+                if not covered: # Only time numbers a player would actually click
+                    continue
+                start = time.perf_counter()
+                if mode == "chord":
+                    Minesweeper._draw_cleared(view, board.chord(index))
+                    clicks += 1
+                else:
+                    for neighbor in covered:
+                        if not board.revealed[neighbor]:
+                            Minesweeper._draw_cleared(view, board.reveal(neighbor))
+                            clicks += 1
+                elapsed += time.perf_counter() - start
+
+        print("chord %dx%d, %d mines, %s: %d clicks, %.2f ms, %.1f us/click" % (
+            width, height, mine_number, mode, clicks, elapsed * 1000, elapsed / max(clicks, 1) * 1e6))
+
+
+
+
+def bench_assets(width = 1234, height = 960):
+    """
+    Cold (empty cache) vs warm load of every image the game uses, at a given window size
+    """
+    import assets
+
+    cache_dir = tempfile.mkdtemp()
+    try:
+        for run in ["cold", "warm"]:
+            assets._source_hashes.clear()
+            start = time.perf_counter()
+            assets.load_image("title.png", (width, height * 0.40), cache_dir = cache_dir)
+            for angle in [25, -25]:
+                assets.load_image("funnybunny_gray.jpg", (width * 0.525, height * 0.525), angle, cache_dir = cache_dir)
+            for path in ["funnybunny_red.jpg", "funnybunny_green.jpg"]:
+                assets.load_image(path, (width, height), cache_dir = cache_dir)
+            print("assets %s: %.3f s" % (run, time.perf_counter() - start))
+    finally:
+        shutil.rmtree(cache_dir)
+
+
+
+
+def bench_audio(plays = 100):
+    """
+    Time from play() to the backend starting the clip, with a backend that only records
+    """
+    import threading
+    from audio import AudioService
+
+    class RecordingBackend(object):
+        def __init__(self):
+            self.started = threading.Event()
+
+        def play(self, clip):
+            self.started.set()
+
+    start = time.perf_counter()
+    service = AudioService(RecordingBackend())
+    service.load("boing", "boing.wav")
+    service.start()
+    print("audio decode + start: %.2f ms" % ((time.perf_counter() - start) * 1000))
+
+    delays = []
+    for play in range(plays):
+        service.backend.started.clear()
+        start = time.perf_counter()
+        service.play("boing")
+        service.backend.started.wait()
+        delays.append(time.perf_counter() - start)
+    delays.sort()
+    print("audio play latency: median %.3f ms, worst %.3f ms" % (delays[len(delays) // 2] * 1000, delays[-1] * 1000))
+
+
+
+
+# Runs in a fresh interpreter so every import is cold; prints seconds since start
+# for: imports done, first menu frame drawn, first (Hard) board playable
+STARTUP_PROBE = """
+import time
+start = time.perf_counter()
+import tkinter as tk
+import main
+print(time.perf_counter() - start)
+try:
+    root = main.root = tk.Tk()
+except tk.TclError:
+    raise SystemExit
+game = main.Minesweeper(root, 800)
+game.pack(fill = "both", expand = True)
+game.canvas.pack()
+root.update()
+print(time.perf_counter() - start)
+game._on_menu_select(2)
+root.update()
+print(time.perf_counter() - start)
+"""
+
+
+
+
+def bench_startup(runs = 5):
+    """
+    Median time to import, to the first menu frame and to the first playable board
+    Needs a display for the last two
+    """
+    results = []
+    for run in range(runs):
+        output = subprocess.run([sys.executable, "-c", STARTUP_PROBE],
+            cwd = os.path.dirname(os.path.abspath(__file__)), capture_output = True, text = True, check = True).stdout
+        results.append([float(line) for line in output.split()])
+
+    for step, name in enumerate(["import", "first menu frame", "first playable board"]):
+        times = sorted(result[step] for result in results if len(result) > step)
+        if times:
+            print("startup %s: %.3f s" % (name, times[len(times) // 2]))
+        else:
+            print("startup %s: skipped, no display" % name)
+
+
+
+
+def bench_click_latency(clicks = 200, seed = 0):
+    """
+    Median time from a synthetic left click to the canvas finishing its redraw,
+    on Hard with each renderer; needs a display
+    """
+    import tkinter as tk
+    import main
+
+    try:
+        root = main.root = tk.Tk()
+    except tk.TclError:
+        print("click latency: skipped, no display")
+        return
+
+    r.seed(seed)
+    for renderer in ["tiles", "image"]:
+        game = main.Minesweeper(root, 800)
+        game.renderer = renderer
+        game.pack(fill = "both", expand = True)
+        game.canvas.pack()
+        game._on_menu_select(2)
+        root.update()
+
+        timings = []
+        while len(timings) < clicks and game.phase in ("first_click", "playing"):
+            safe = [index for index in range(game.board.size)
+                if not game.board.revealed[index] and not (game.board.mines_placed and game.board.mines[index])]
+            if not safe:
+                break
+            row, col = divmod(r.choice(safe), game.board_tile_width)
+            start = time.perf_counter()
+            game.canvas.event_generate("<Button-1>", x = int((col + 0.5) * game.tile_length), y = int((row + 0.5) * game.tile_length))
+            root.update_idletasks()
+            timings.append(time.perf_counter() - start)
+
+        timings.sort()
+        print("click latency %s: %.2f ms median, %.2f ms worst over %d clicks" % (
+            renderer, timings[len(timings) // 2] * 1000, timings[-1] * 1000, len(timings)))
+        game.scheduler.cancel_all()
+        game.destroy()
+        game.canvas.destroy()
+    root.destroy()
+
+
+
+
+if __name__ == "__main__":
+    # python3 bench.py suite checks canvas calls against the stored baselines; add --update
+    # to rewrite them, or --timing to check times too (on the machine that wrote them)
+    if sys.argv[1:2] == ["suite"]:
+        bench_suite(update = "--update" in sys.argv, timing = "--timing" in sys.argv)
+        sys.exit()
+
+    # Sizes can be passed as extra arguments, e.g. python3 bench.py 3000
+    sizes = [int(size) for size in sys.argv[1:]] or [1000, 2000]
+    for size in sizes:
+        bench_reveal(size, size, size)
+    for density in [0.1, 0.5, 0.9]:
+        bench_place_mines(500, 500, density)
+    for use_numpy in [False, True] if load_numpy() else [False]:
+        bench_generate(2000, 2000, 800000, use_numpy)
+    bench_memory(500, 500)
+    bench_chord(24, 20, 99)
+    bench_chord(200, 200, 8000)
+    bench_engines(24, 20, 99, games = 1000)
+    bench_engines(1000, 1000, 1000)
+    bench_solver(24, 20, 99)
+    bench_no_guess()
+    for width, height, mine_number in PRESETS.values():
+        bench_replay(width, height, mine_number)
+    bench_assets()
+    bench_startup()
+    bench_click_latency()
+    bench_perf_hooks()
+    bench_audio()
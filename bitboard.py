@@ -0,0 +1,299 @@
+from engine import sample_mines, seeded_rng
+
+
+
+
+# Bitboard backend for the game logic
+# Every layer is one Python int with bit i standing for tile i (row * width + col),
+# so counting neighbours, flood filling and checking for a win are whole-board
+# shifts and masks instead of per-tile loops
+# Exposes the same interface as engine.Board
+
+
+
+
+# bytes.translate table turning the "0"/"1" characters of bin() into 0/1 bytes
+_BIT_CHARS = bytes.maketrans(b"01", b"\x00\x01")
+
+
+
+
+class BitView(object):
+    """
+    Read-only tile access to a bitmask, so views can index it like a Board layer
+    The mask is copied to bytes once; shifting the whole int per lookup would
+    make every lookup cost as much as the board is big
+    """
+    __slots__ = ("bits", "data")
+
+    def __init__(self, bits, size):
+        self.bits = bits
+        self.data = bits.to_bytes((size + 7) // 8, "little")
+
+    def __getitem__(self, index):
+        return (self.data[index >> 3] >> (index & 7)) & 1
+
+
+
+
+def spread_bits(bits, size):
+    """
+    One byte per tile, 0 or 1, from a mask
+    """
+    return bin(bits)[:1:-1].encode().translate(_BIT_CHARS).ljust(size, b"\x00")
+
+
+
+
+class BitBoard(object):
+    def __init__(self, width, height, mine_number, safe_radius = 1, seed = None):
+        """
+        Holds everything about a game except how it looks
+        A seed makes mine placement repeatable; without one it uses the random module
+        """
+        self.width = width
+        self.height = height
+        self.mine_number = mine_number
+        self.safe_radius = safe_radius
+        self.seed = seed
+        self.size = width * height
+
+
+        # Masks of tiles that have a neighbour to their left/right, to stop shifts wrapping rows
+        self.full = (1 << self.size) - 1
+        row_mask = (1 << width) - 1
+        every_row = self.full // row_mask # Bit 0 of every row, the sum of the series 2 ** (width * row)
+        self.has_left = every_row * (row_mask & ~1)
+        self.has_right = every_row * (row_mask >> 1)
+
+
+        # Layers
+        self.mine_bits = 0
+        self.revealed_bits = 0
+        self.flagged_bits = 0
+        self.count_planes = (0, 0, 0, 0)
+        self.blank_bits = 0
+        self.mines_near = bytes(self.size) # Counts as one byte per tile, like Board, for views and solvers
+        self.views = {} # Attribute name -> BitView of its current mask
+
+
+        # Game progress
+        self.mines_placed = False
+        self.tiles_cleared = 0
+        self.lost = False
+
+
+
+
+    def _view(self, name):
+        """
+        BitView of a mask attribute, rebuilt only after the mask changes
+        """
+        bits = getattr(self, name)
+        view = self.views.get(name)
+        if view is None or view.bits is not bits:
+            view = self.views[name] = BitView(bits, self.size)
+        return view
+
+
+    # Board style layer access for views and solvers
+    mines = property(lambda self: self._view("mine_bits"))
+    revealed = property(lambda self: self._view("revealed_bits"))
+    flagged = property(lambda self: self._view("flagged_bits"))
+
+
+
+
+    def _neighbor_masks(self, bits):
+        """
+        The 8 copies of a mask shifted so bit i says whether that neighbour of tile i is set
+        """
+        width = self.width
+        full = self.full
+        left = (bits << 1) & self.has_left
+        right = (bits >> 1) & self.has_right
+        masks = [left, right]
+        for row_bits in (bits, left, right):
+            masks.append((row_bits << width) & full)
+            masks.append(row_bits >> width)
+        return masks
+
+
+
+
+    def _dilate(self, bits):
+        """
+        Grow a mask by one tile in all 8 directions
+        """
+        bits |= ((bits << 1) & self.has_left) | ((bits >> 1) & self.has_right)
+        return bits | ((bits << self.width) & self.full) | (bits >> self.width)
+
+
+
+
+    def place_mines(self, first_index, mine_indexes = None):
+        """
+        Distribute mines and work out every tile's number
+        mine_indexes places a known layout (e.g. a pre-generated board) instead
+        """
+        if mine_indexes is None:
+            mine_indexes = sample_mines(self.width, self.height, self.mine_number, first_index, self.safe_radius, seeded_rng(self.seed))
+
+
+        # Set bits in a byte buffer first; or-ing in one big int per mine would copy the whole board each time
+        buffer = bytearray((self.size + 7) // 8)
+        for index in mine_indexes:
+            buffer[index >> 3] |= 1 << (index & 7)
+        mine_bits = int.from_bytes(buffer, "little")
+        self.mine_bits = mine_bits
+
+
+        # Add the 8 neighbour masks into 4 bit planes, one ripple carry add each
+        planes = [0, 0, 0, 0]
+        for carry in self._neighbor_masks(mine_bits):
+            for bit in range(4):
+                if not carry:
+                    break
+                planes[bit], carry = planes[bit] ^ carry, planes[bit] & carry
+        self.count_planes = tuple(planes)
+        self.mines_near = sum(int.from_bytes(spread_bits(plane, self.size), "little") << bit
+            for bit, plane in enumerate(planes)).to_bytes(self.size, "little")
+        self.blank_bits = self.full & ~mine_bits & ~(planes[0] | planes[1] | planes[2] | planes[3])
+
+        self.mines_placed = True
+
+
+
+
+    def get_neighbors(self, index):
+        """
+        Find the (up to) 8 tiles around a given tile
+        """
+        row, col = divmod(index, self.width)
+        return [n_row * self.width + n_col
+            for n_row in range(max(row - 1, 0), min(row + 2, self.height))
+            for n_col in range(max(col - 1, 0), min(col + 2, self.width))
+            if n_row != row or n_col != col]
+
+
+
+
+    def is_numbered(self, index):
+        """
+        True for safe tiles that touch at least one mine
+        """
+        return not (self.mine_bits >> index) & 1 and not (self.blank_bits >> index) & 1
+
+
+
+
+    def reveal(self, index):
+        """
+        Uncover a tile; returns every tile that was newly cleared
+        Revealing a mine loses the game and clears nothing
+        """
+        return bit_indexes(self.reveal_bits(index))
+
+
+
+
+    def reveal_bits(self, index):
+        """
+        Same as reveal but returns the cleared tiles as a mask, which skips
+        turning them into a list when nothing needs to draw them
+        """
+        tile = 1 << index
+        if (self.revealed_bits | self.flagged_bits) & tile:
+            return 0
+        if self.mine_bits & tile:
+            self.lost = True
+            return 0
+        return self._flood(tile)
+
+
+
+
+    def chord(self, index):
+        """
+        Reveal every unflagged neighbour of a revealed number once that many flags surround it
+        They all open in one flood fill; returns the cleared tiles like reveal
+        A wrong flag leaves a mine among them, which loses the game
+        """
+        return bit_indexes(self.chord_bits(index))
+
+
+
+
+    def chord_bits(self, index):
+        """
+        Same as chord but returns the cleared tiles as a mask
+        """
+        tile = 1 << index
+        mines_near = self.mines_near[index]
+        if not self.revealed_bits & tile or not mines_near:
+            return 0
+        around = self._dilate(tile) & ~tile
+        if (around & self.flagged_bits).bit_count() != mines_near:
+            return 0
+
+        targets = around & ~self.flagged_bits & ~self.revealed_bits
+        if targets & self.mine_bits:
+            self.lost = True
+            return 0
+        return self._flood(targets)
+
+
+
+
+    def _flood(self, tiles):
+        """
+        Open a mask of safe tiles and everything their blank tiles lead to
+        """
+        # Blank tiles on the edge of the opened area open everything around
+        # them that isn't a mine, a flag or already revealed
+        closed = self.mine_bits | self.flagged_bits | self.revealed_bits
+        opened = tiles
+        frontier = tiles
+        while frontier & self.blank_bits:
+            frontier = self._dilate(frontier & self.blank_bits) & ~closed & ~opened
+            opened |= frontier
+
+        self.revealed_bits |= opened
+        self.tiles_cleared += opened.bit_count()
+        return opened
+
+
+
+
+    def toggle_flag(self, index):
+        """
+        Flag or unflag a covered tile; returns whether it now has a flag
+        """
+        tile = 1 << index
+        if not self.revealed_bits & tile:
+            self.flagged_bits ^= tile
+        return bool(self.flagged_bits & tile)
+
+
+
+
+    def is_won(self):
+        """
+        Game is won once every safe tile is cleared
+        """
+        return self.revealed_bits | self.mine_bits == self.full
+
+
+
+
+def bit_indexes(bits):
+    """
+    Indexes of the set bits in a mask, lowest first
+    Trailing zeros are shifted out first, so the scan only covers the span of set
+    bits instead of everything below them
+    """
+    if not bits:
+        return []
+    low = (bits & -bits).bit_length() - 1
+    binary = bin(bits >> low)[:1:-1]
+    return [index + low for index, bit in enumerate(binary) if bit == "1"]
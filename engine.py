@@ -0,0 +1,443 @@
+import random as r
+from array import array
+from functools import lru_cache
+from itertools import chain
+
+# NumPy is optional; neighbour counts fall back to pure Python without it
+# It takes a while to import, so load_numpy only does that once a big board needs it
+# It only speeds up counting: mines are still sampled with random, so a seed gives
+# the same board with or without NumPy (replays rely on that). On 2000x2000 with
+# 800k mines sampling takes 1-1.7 s either way, counting 0.1-0.35 s with NumPy
+# and about 2 s without (bench.py generate)
+np = None
+NUMPY_MIN_TILES = 10000
+
+# (width, height, mines) for each menu difficulty
+PRESETS = {
+    "Easy": (10, 8, 10),
+    "Medium": (18, 14, 40),
+    "Hard": (24, 20, 99),
+}
+
+# Rough bytes per tile each engine needs while playing, to check custom sizes against a budget
+# Board: 4 one byte layers plus its neighbour table (up to 8 four byte cells and a start per tile)
+# BitBoard: a bit per tile in each mask, the one byte counts, and place_mines' working copies
+ENGINE_TILE_BYTES = {"array": 40, "bitboard": 4}
+MEMORY_BUDGET = 1 << 30
+BITBOARD_MIN_TILES = 250000 # Past this the neighbour table alone takes seconds to build
+
+
+
+
+# Headless game logic for Minesweeper
+# Nothing in here touches tkinter, so boards can be generated and played
+# without a display (simulations, benchmarks, solvers)
+# Tiles are addressed by a flat index, row * width + col
+
+
+
+
+def load_numpy():
+    """
+    Import NumPy the first time it's needed; returns None if it isn't installed
+    """
+    global np
+    if np is None:
+        try:
+            import numpy
+            np = numpy
+        except ImportError:
+            np = False
+    return np or None
+
+
+
+
+@lru_cache(maxsize = 4)
+def neighbor_table(width, height):
+    """
+    CSR style lookup of the (up to) 8 tiles around every tile
+    Neighbours of index i are cells[starts[i]:starts[i + 1]]
+    Built once per board size and shared by every game of that size
+    """
+    starts = array("I", [0])
+    cells = array("I")
+
+    def add_tile(row, col):
+        cells.extend([n_row * width + n_col
+            for n_row in range(max(row - 1, 0), min(row + 2, height))
+            for n_col in range(max(col - 1, 0), min(col + 2, width))
+            if n_row != row or n_col != col])
+        starts.append(len(cells))
+
+    for row in range(height):
+        add_tile(row, 0)
+        if width < 3:
+            if width == 2:
+                add_tile(row, 1)
+            continue
+
+
+        # Tiles away from the left/right edges all share the same offsets, so a
+        # whole row of them is laid out at once by interleaving shifted ranges
+        offsets = [row_diff * width + col_diff
+            for row_diff in (-1, 0, 1) if 0 <= row + row_diff < height
+            for col_diff in (-1, 0, 1) if row_diff or col_diff]
+        first = row * width + 1
+        cells.extend(chain.from_iterable(zip(*[range(first + offset, first + width - 2 + offset) for offset in offsets])))
+        starts.extend(range(starts[-1] + len(offsets), len(cells) + 1, len(offsets)))
+
+        add_tile(row, width - 1)
+    return starts, cells
+
+
+
+
+def sample_mines(width, height, mine_number, first_index, safe_radius, rng = r):
+    """
+    Pick mine indexes, ensuring none are within safe_radius tiles of the first click
+    Samples without replacement, so it takes the same time at any density
+    rng is anything with a random.sample, e.g. a seeded random.Random
+    """
+
+
+    top, bottom, left, right = safe_zone(width, height, first_index, safe_radius)
+    safe_number = (bottom - top + 1) * (right - left + 1)
+    if mine_number > width * height - safe_number:
+        raise ValueError("%d mines do not fit on a %dx%d board outside the first click" % (
+            mine_number, width, height))
+
+
+    # A random ordering of (mines + safe) tile indices always holds at least
+    # mine_number tiles outside the safe zone; its first ones are a uniform pick
+    mine_indexes = []
+    for index in rng.sample(range(width * height), mine_number + safe_number):
+        if len(mine_indexes) == mine_number:
+            break
+        row, col = divmod(index, width)
+        if not (top <= row <= bottom and left <= col <= right):
+            mine_indexes.append(index)
+    return mine_indexes
+
+
+
+
+def safe_zone(width, height, first_index, safe_radius):
+    """
+    (top, bottom, left, right) rows and columns kept clear around a first click
+    The zone is clipped to the board, so corner clicks protect fewer tiles
+    """
+    first_row, first_col = divmod(first_index, width)
+    return (max(first_row - safe_radius, 0), min(first_row + safe_radius, height - 1),
+        max(first_col - safe_radius, 0), min(first_col + safe_radius, width - 1))
+
+
+
+
+def fitting_safe_radius(width, height, mine_number, first_index, safe_radius):
+    """
+    Largest radius up to safe_radius whose safe zone around first_index leaves room for the mines
+    On boards packed that tight, clicks away from the corners get a smaller zone
+    """
+    while safe_radius > 0:
+        top, bottom, left, right = safe_zone(width, height, first_index, safe_radius)
+        if mine_number <= width * height - (bottom - top + 1) * (right - left + 1):
+            break
+        safe_radius -= 1
+    return safe_radius
+
+
+
+
+def seeded_rng(seed):
+    """
+    A random.Random for seed, or the shared random module if seed is None
+    """
+    return r if seed is None else r.Random(seed)
+
+
+
+
+class Board(object):
+    def __init__(self, width, height, mine_number, safe_radius = 1, use_numpy = None, seed = None):
+        """
+        Holds everything about a game except how it looks
+        A seed makes mine placement repeatable; without one it uses the random module
+        """
+        self.width = width
+        self.height = height
+        self.mine_number = mine_number
+        self.safe_radius = safe_radius
+        self.seed = seed
+        self.use_numpy = use_numpy # None picks NumPy for boards of NUMPY_MIN_TILES or more, if installed
+
+
+        # Each layer is a flat bytearray indexed by tile index, one byte per tile
+        self.size = width * height
+        self.mines = bytearray(self.size)
+        self.mines_near = bytearray(self.size)
+        self.revealed = bytearray(self.size)
+        self.flagged = bytearray(self.size)
+        self.neighbor_starts, self.neighbor_cells = neighbor_table(width, height)
+
+
+        # Game progress
+        self.mines_placed = False
+        self.tiles_cleared = 0
+        self.lost = False
+
+
+
+
+    def place_mines(self, first_index, mine_indexes = None):
+        """
+        Distribute mines and work out every tile's number
+        mine_indexes places a known layout (e.g. a pre-generated board) instead
+        """
+        if mine_indexes is None:
+            mine_indexes = sample_mines(self.width, self.height, self.mine_number, first_index, self.safe_radius, seeded_rng(self.seed))
+        if self.use_numpy is None:
+            self.use_numpy = self.size >= NUMPY_MIN_TILES and load_numpy() is not None
+        else:
+            self.use_numpy = bool(self.use_numpy) and load_numpy() is not None # Asked for but not installed
+        if self.use_numpy:
+            self._count_mines_numpy(mine_indexes)
+        else:
+            mines = self.mines
+            mines_near = self.mines_near
+            starts = self.neighbor_starts
+            cells = self.neighbor_cells
+            for index in mine_indexes:
+                mines[index] = 1
+
+                # Update numbers for all tiles around mine
+                for neighbor in cells[starts[index]:starts[index + 1]]:
+                    mines_near[neighbor] += 1
+
+        self.mines_placed = True
+
+
+
+
+    def _count_mines_numpy(self, mine_indexes):
+        """
+        Build the mine mask and every number at once
+        The mask is padded by one tile so the 8 shifted slices summed together
+        give each tile's neighbour count without any bounds checks
+        """
+        mask = np.zeros(self.size, dtype = bool)
+        mask[np.fromiter(mine_indexes, dtype = np.intp, count = len(mine_indexes))] = True
+        mask = mask.reshape(self.height, self.width)
+
+        padded = np.pad(mask, 1).astype(np.uint8)
+        counts = np.zeros((self.height, self.width), dtype = np.uint8)
+        for row_shift in range(3):
+            for col_shift in range(3):
+                if row_shift != 1 or col_shift != 1:
+                    counts += padded[row_shift:row_shift + self.height, col_shift:col_shift + self.width]
+
+        self.mines = bytearray(mask.tobytes())
+        self.mines_near = bytearray(counts.tobytes())
+
+
+
+
+    def get_neighbors(self, index):
+        """
+        Find the (up to) 8 tiles around a given tile
+        """
+        return self.neighbor_cells[self.neighbor_starts[index]:self.neighbor_starts[index + 1]]
+
+
+
+
+    def is_numbered(self, index):
+        """
+        True for safe tiles that touch at least one mine
+        """
+        return not self.mines[index] and self.mines_near[index] > 0
+
+
+
+
+    def reveal(self, index):
+        """
+        Uncover a tile; returns every tile that was newly cleared
+        Revealing a mine loses the game and clears nothing
+        """
+        if self.revealed[index] or self.flagged[index]:
+            return []
+        if self.mines[index]:
+            self.lost = True
+            return []
+
+        return self._clear_tiles([index])
+
+
+
+
+    def chord(self, index):
+        """
+        Reveal every unflagged neighbour of a revealed number once that many flags surround it
+        They all open in one flood fill; returns the cleared tiles like reveal
+        A wrong flag leaves a mine among them, which loses the game
+        """
+        mines_near = self.mines_near[index]
+        if not self.revealed[index] or not mines_near:
+            return []
+        revealed = self.revealed
+        flagged = self.flagged
+        neighbors = self.get_neighbors(index)
+        if sum(flagged[neighbor] for neighbor in neighbors) != mines_near:
+            return []
+
+        targets = [neighbor for neighbor in neighbors if not revealed[neighbor] and not flagged[neighbor]]
+        if any(self.mines[neighbor] for neighbor in targets):
+            self.lost = True
+            return []
+        return self._clear_tiles(targets)
+
+
+
+
+    def _clear_tiles(self, indexes):
+        """
+        Flood fill from some tiles using an explicit stack; stops on numbered tiles
+        Tiles are marked when pushed so each is visited once, which keeps this
+        linear in the size of the opened area with no recursion
+        """
+        revealed = self.revealed
+        flagged = self.flagged
+        mines_near = self.mines_near
+        starts = self.neighbor_starts
+        cells = self.neighbor_cells
+
+        for index in indexes:
+            revealed[index] = 1
+        cleared = list(indexes)
+        stack = list(indexes)
+        while stack:
+            index = stack.pop()
+
+            # Spread to all nearby tiles if current isn't numbered
+            if mines_near[index] == 0:
+                for neighbor in cells[starts[index]:starts[index + 1]]:
+                    if not revealed[neighbor] and not flagged[neighbor]:
+                        revealed[neighbor] = 1
+                        cleared.append(neighbor)
+                        stack.append(neighbor)
+
+        self.tiles_cleared += len(cleared)
+        return cleared
+
+
+
+
+    def toggle_flag(self, index):
+        """
+        Flag or unflag a covered tile; returns whether it now has a flag
+        """
+        if not self.revealed[index]:
+            self.flagged[index] ^= 1
+        return self.flagged[index] == 1
+
+
+
+
+    def is_won(self):
+        """
+        Game is won once every safe tile is cleared
+        """
+        return self.tiles_cleared == self.size - self.mine_number
+
+
+
+
+def make_board(width, height, mine_number, engine = "array", **options):
+    """
+    Build a board with the chosen backend
+    "array" is Board; "bitboard" keeps every layer in one big int (bitboard.BitBoard)
+    """
+    if engine == "bitboard":
+        from bitboard import BitBoard
+        return BitBoard(width, height, mine_number, **options)
+    elif engine == "array":
+        return Board(width, height, mine_number, **options)
+    raise ValueError("Unknown engine %r" % engine)
+
+
+
+
+def parse_size(words):
+    """
+    (width, height, mines) from a difficulty name or "width height mines"
+    Raises ValueError for anything else
+    """
+    if len(words) == 1 and words[0] in PRESETS:
+        return PRESETS[words[0]]
+    if len(words) == 3:
+        return tuple(int(word) for word in words)
+    raise ValueError("Size must be one of %s or width height mines" % ", ".join(PRESETS))
+
+
+
+
+def choose_engine(width, height, mine_number, engine = "array", memory_budget = MEMORY_BUDGET,
+        safe_radius = 1, switch = True):
+    """
+    Check a board size and return the engine to play it with
+    With switch, engine is swapped for the bitboard once the board is past
+    BITBOARD_MIN_TILES or won't fit in memory_budget bytes; without, it's kept
+    Raises ValueError if the size makes no sense or the engine doesn't fit
+    """
+    if engine not in ENGINE_TILE_BYTES:
+        raise ValueError("Unknown engine %r" % engine)
+    tiles = width * height
+    if width < 1 or height < 1:
+        raise ValueError("A %dx%d board has no tiles" % (width, height))
+
+
+    # A corner click has the smallest safe zone; other clicks shrink theirs to
+    # fit if they must (see fitting_safe_radius)
+    corner_zone = min(safe_radius + 1, width) * min(safe_radius + 1, height)
+    if not 0 <= mine_number <= tiles - corner_zone:
+        raise ValueError("%d mines do not fit on a %dx%d board around the first click" % (
+            mine_number, width, height))
+    if switch and (tiles >= BITBOARD_MIN_TILES or tiles * ENGINE_TILE_BYTES[engine] > memory_budget):
+        engine = "bitboard"
+    if tiles * ENGINE_TILE_BYTES[engine] > memory_budget:
+        raise ValueError("A %dx%d board needs about %.1f MB, over the %.1f MB budget" % (
+            width, height, tiles * ENGINE_TILE_BYTES[engine] / 2 ** 20, memory_budget / 2 ** 20))
+    return engine
+
+
+
+
+def three_bv(board):
+    """
+    3BV: the fewest clicks that clear a board with mines placed
+    Each opening (connected blank tiles plus the numbers around them) is one click,
+    and every number not touching an opening is one more
+    """
+    mines = board.mines
+    mines_near = board.mines_near
+    covered = bytearray(board.size) # Cleared by an opening already counted
+    clicks = 0
+
+    for index in range(board.size):
+        if covered[index] or mines[index] or mines_near[index]:
+            continue
+        clicks += 1
+        covered[index] = 1
+        stack = [index]
+        while stack:
+            for neighbor in board.get_neighbors(stack.pop()):
+                if not covered[neighbor]:
+                    covered[neighbor] = 1
+                    if not mines_near[neighbor]:
+                        stack.append(neighbor)
+
+    for index in range(board.size):
+        if not covered[index] and not mines[index]:
+            clicks += 1
+    return clicks
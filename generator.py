@@ -0,0 +1,124 @@
+import random as r
+import time
+
+from engine import PRESETS, Board
+from solver import Solver
+
+
+
+
+# No-guess boards: mine layouts the solver clears from the first click without
+# ever guessing. Most random layouts need a guess (about 7 in 8 on Hard), so
+# finding one takes a few dozen tries; BoardPool does that ahead of time
+#
+# A layout is stored as (seed, placement, opening): a board with that seed gets
+# the same mines from place_mines(placement), and opening holds the blank tiles
+# that click uncovers. Clicking any of them uncovers the exact same area, so
+# the layout suits every first click inside its opening
+
+
+
+
+def attempt_no_guess(width, height, mine_number, first_index, safe_radius = 1):
+    """
+    One random layout around first_index; returns (seed, first_index, opening) if
+    the solver clears it without guessing, otherwise None
+    """
+    seed = r.getrandbits(32)
+    board = Board(width, height, mine_number, safe_radius, seed = seed)
+    board.place_mines(first_index)
+    solver = Solver(board)
+    cleared = solver.reveal(first_index)
+    if not solver.solve():
+        return None
+    mines_near = board.mines_near
+    return seed, first_index, frozenset(index for index in cleared if not mines_near[index])
+
+
+
+
+def generate_no_guess(width, height, mine_number, first_index, max_attempts = 10000, max_seconds = None):
+    """
+    Keep trying layouts until one needs no guessing; returns its (seed, first_index, opening)
+    max_seconds also gives up once that long has passed, checked between attempts
+    """
+    give_up = time.monotonic() + max_seconds if max_seconds is not None else None
+    for attempt in range(max_attempts):
+        layout = attempt_no_guess(width, height, mine_number, first_index)
+        if layout is not None:
+            return layout
+        if give_up is not None and time.monotonic() > give_up:
+            break
+    raise ValueError("No no-guess layout for a %dx%d board with %d mines in %d attempts" % (
+        width, height, mine_number, attempt + 1))
+
+
+
+
+class BoardPool(object):
+    def __init__(self, sizes = PRESETS):
+        """
+        Pre-generated no-guess layouts for each size in sizes (name -> (width, height, mines))
+        fill keeps going until every tile of every size is inside the opening of
+        some pooled layout, so any first click can be answered from the pool
+        """
+        self.sizes = dict(sizes)
+        self.layouts = {name: [] for name in self.sizes}
+
+
+
+
+    def uncovered(self, name):
+        """
+        Tiles of the named size that no pooled layout opens, lowest first
+        """
+        width, height = self.sizes[name][:2]
+        covered = set().union(*[opening for seed, placement, opening in self.layouts[name]])
+        return [index for index in range(width * height) if index not in covered]
+
+
+
+
+    def take(self, name, first_index):
+        """
+        Remove and return (seed, placement) of a pooled layout that opens at first_index
+        None if nothing fits
+        """
+        layouts = self.layouts[name]
+        for number, (seed, placement, opening) in enumerate(layouts):
+            if first_index in opening:
+                del layouts[number]
+                return seed, placement
+        return None
+
+
+
+
+    def get(self, name, first_index, max_seconds = None):
+        """
+        (seed, placement) for a no-guess game: from the pool if possible, otherwise made now
+        A board with that seed gets its mines from place_mines(placement)
+        max_seconds bounds making one now; raises ValueError if that runs out
+        """
+        layout = self.take(name, first_index)
+        if layout is None:
+            layout = generate_no_guess(*self.sizes[name], first_index, max_seconds = max_seconds)[:2]
+        return layout
+
+
+
+
+    def fill(self):
+        """
+        Scheduler task: one attempt per step until every tile of every size is covered
+        Each attempt is made around an uncovered tile, which always ends up in its
+        opening, and takes a few milliseconds, so it fits in a frame next to the animations
+        """
+        for name, (width, height, mine_number) in self.sizes.items():
+            missing = self.uncovered(name)
+            while missing:
+                layout = attempt_no_guess(width, height, mine_number, r.choice(missing))
+                yield 0
+                if layout is not None:
+                    self.layouts[name].append(layout)
+                    missing = [index for index in missing if index not in layout[2]]
@@ -1,15 +1,22 @@
 import tkinter as tk
 import random as r
 import math
-import threading
+import sys
 import time
 
+from audio import AudioService
+import perf
+from engine import MEMORY_BUDGET, PRESETS, choose_engine, fitting_safe_radius, make_board, parse_size
+from replay import CHORD, FLAG, REVEAL, Recorder
+from scheduler import Scheduler
+
 # Modules that need to be installed
+# They're slow to import, so each is imported where it's first used
+# (Pillow for the menu images and big board renderers, a sound backend once a game starts)
 
-# python3 -m pip install playsound==1.2.2
+# python3 -m pip install simpleaudio # Sound on Linux and macOS, played from memory
+# python3 -m pip install playsound==1.2.2 # Fallback if simpleaudio won't install
 # python3 -m pip install Pillow
-from PIL import ImageTk, Image
-from playsound import playsound
 
 
 
@@ -34,6 +41,28 @@ class Minesweeper(tk.Frame):
         self.board_tile_width = 18
         self.board_tile_height = 14
         self.mine_number = 40
+        self.engine = "array" # Game logic backend, "array" or "bitboard"
+        # "tiles" draws canvas items per tile, "image" draws one Pillow image,
+        # "viewport" draws only the visible part of boards bigger than the window
+        self.renderer = "tiles"
+        self.no_guess = False # Only deal boards the solver clears without guessing
+        # Custom sizes have no pooled layouts (and the pool may not have reached a
+        # preset yet), so the first click looks for one itself, only on boards
+        # this small (one solver attempt is ~40 ms at 2500 tiles) and for at most
+        # this long, before dealing a random board instead
+        self.no_guess_max_tiles = 2500
+        self.no_guess_seconds = 0.25
+
+
+        # Every size is checked against these before a game starts; with auto_setup
+        # big boards also switch to the bitboard engine, to one image instead of a
+        # canvas item per tile, and to a viewport once tiles get too small to click
+        self.memory_budget = MEMORY_BUDGET # Bytes the game logic may use
+        self.item_budget = 100000 # Most tiles drawn as canvas items
+        self.min_tile_length = 8 # Pixels
+        self.auto_setup = True
+        self.game_engine = self.engine # What the current game actually uses
+        self.game_renderer = self.renderer
         self.tile_length = board_pixel_height / self.board_tile_height
         self.board_pixel_width = int(self.tile_length * self.board_tile_width)   
         self.board_pixel_height = int(self.tile_length * self.board_tile_height)
@@ -47,28 +76,51 @@ class Minesweeper(tk.Frame):
         self.buttons = []
         self.button_font = ('Rockwell', int(self.board_pixel_height / 35))
         self.button_placeholder = tk.PhotoImage(width = 1, height = 1) # Make label pos based off of pixels instead of font size
-        self.difficulties = ["Easy", "Medium", "Hard"]
-        self.button_padding = 0.2
+        self.difficulties = ["Easy", "Medium", "Hard", "Custom"]
+        self.button_padding = 0.16
         self.button_y_offset = 0.25
 
-        self.title_screen = ImageTk.PhotoImage(Image.open("title.png").resize(
-            (int(self.board_pixel_width), int(self.board_pixel_height * 0.40))))
+        import assets
+        from PIL import ImageTk
+        self.title_screen = ImageTk.PhotoImage(assets.load_image(
+            "title.png", (self.board_pixel_width, self.board_pixel_height * 0.40)))
 
 
         # Dancing mochi
-        bg_img = Image.open(
-            "funnybunny_gray.jpg").resize(
-            (int(self.board_pixel_width * 0.525), int(self.board_pixel_height * 0.525)))
-        self.mochi_pos_1 = ImageTk.PhotoImage(bg_img.rotate(25, fillcolor = "white", expand = 1))
-        self.mochi_pos_2 = ImageTk.PhotoImage(bg_img.rotate(-25, fillcolor = "white",  expand = 1))
-        self.menu_active = True
+        bg_size = (self.board_pixel_width * 0.525, self.board_pixel_height * 0.525)
+        self.mochi_pos_1 = ImageTk.PhotoImage(assets.load_image("funnybunny_gray.jpg", bg_size, 25))
+        self.mochi_pos_2 = ImageTk.PhotoImage(assets.load_image("funnybunny_gray.jpg", bg_size, -25))
 
 
         # Miscallaneous setup
         self.start_time = 0
-        self.canvas.tag_bind("first_click_setup", "<Button-1>", self._on_first_click)
-        self.lose_screen = ImageTk.PhotoImage(Image.open("funnybunny_red.jpg").resize((self.board_pixel_width, self.board_pixel_height)))
-        self.win_screen = ImageTk.PhotoImage(Image.open("funnybunny_green.jpg").resize((self.board_pixel_width, self.board_pixel_height)))
+        self.scheduler = Scheduler(self.root) # Every animation and timer runs through this
+        self.dance_task = None
+        self.timer_task = None
+        self.recorder = None # Replay log of the current game, made on the first click
+        self.save_replays = True # Write each finished game's log to replays/
+        self.mine_task = None
+        self.tile_pool = [] # Rows of Tiles kept between games, see _pool_tiles
+        self.board_pool = None # No-guess layouts, made in the background while the menu is up
+        self.fill_task = None
+
+        # One binding for every click on the board; the game phase decides what it does
+        # "menu", "first_click" (mines not placed yet), "playing", "over" (end
+        # animation running, clicks ignored) or "end" (any click goes to the menu)
+        self.phase = "menu"
+        self.canvas.bind("<Button>", self._on_click)
+        self.root.bind("<F3>", self._toggle_hud)
+        self.show_hud = False # Performance overlay; turning it on also turns on the perf hooks
+        self.hud_task = None
+        self.canvas.bind("<MouseWheel>", self._on_scroll)
+        self.canvas.bind("<Button-4>", self._on_scroll)
+        self.canvas.bind("<Button-5>", self._on_scroll)
+        self.canvas.bind("<ButtonPress-2>", self._on_drag_start)
+        self.canvas.bind("<B2-Motion>", self._on_drag)
+        self.end_screen_size = (self.board_pixel_width, self.board_pixel_height)
+        self.end_screens = {} # Win/lose images load on the first end screen that needs them
+        self.audio = AudioService()
+        self.audio.load("boing", "boing.wav")
         self.mine_reveal_colors = {
             "#FF0000": "#7f0000", # Red
             "#FC6404": "#7e3101", # Orange
@@ -89,21 +141,24 @@ class Minesweeper(tk.Frame):
         """
         Creates components for the main menu (title, dance, buttons)
         """
-        self.canvas.delete("all")
-        self.menu_active = True
+        self.canvas.delete("!cell && !hud") # Pooled tiles only hide, ready for the next game
+        self.canvas.itemconfig("cell", state = "hidden")
+        self.scheduler.cancel_all() # Nothing from the last game should keep running
+        if self.show_hud:
+            self.hud_task = self.scheduler.start(self._hud())
         self.root.title("Minesweeper!")
+        if self.no_guess:
+            self._fill_board_pool()
 
 
-        # Click is used after game over to get to the menu; this binding needs to be reset
-        self.root.unbind("<Button>")
-        self.canvas.tag_bind("clickable", "<Button>", self._on_tile_click)
+        self.phase = "menu"
 
 
         # Setup difficulty buttons; board size can change between loops
         button_width = int(self.board_pixel_width / 4)
         button_height = int(self.board_pixel_height / 10)
 
-        for button_number in range(3):
+        for button_number in range(len(self.difficulties)):
             button = tk.Button(
                 self.root,
                 fg = "#696773",
@@ -124,6 +179,20 @@ class Minesweeper(tk.Frame):
             self.buttons.append(button)
 
 
+        # No-guess mode toggle under the mochi
+        self.no_guess_button = tk.Button(
+            self.root,
+            fg = "#696773",
+            bd = 3,
+            text = "No guessing: %s" % ("On" if self.no_guess else "Off"),
+            font = self.button_font,
+            command = self._toggle_no_guess,
+            overrelief = tk.GROOVE
+            )
+        self.no_guess_button.place(relx = 1 / 3, rely = 0.95, anchor = "center")
+        self.buttons.append(self.no_guess_button)
+
+
         # Create title, start mochi dance
         displayed_bg = self.canvas.create_image(
                     self.board_pixel_width / 3, self.board_pixel_height / 1.55, 
@@ -133,7 +202,7 @@ class Minesweeper(tk.Frame):
             0, 0, 
             anchor = "nw", 
             image = self.title_screen)
-        threading.Thread(target = self._bun_dance, args = (displayed_bg,), daemon = True).start()  
+        self.dance_task = self.scheduler.start(self._bun_dance(displayed_bg))
               
 
 
@@ -142,60 +211,176 @@ class Minesweeper(tk.Frame):
         """
         MOCHI DANCE MOCHI DANCE
         """
-        while self.menu_active == True:
-            time.sleep(0.75)
+        while True:
+            yield 0.75
             self.canvas.itemconfig(bg, image = self.mochi_pos_2)
-            time.sleep(0.75)
+            yield 0.75
             self.canvas.itemconfig(bg, image = self.mochi_pos_1)
 
 
 
 
+    def _toggle_no_guess(self):
+        """
+        Turn no-guess boards on or off; the pool only fills while they're on
+        """
+        self.no_guess = not self.no_guess
+        self.no_guess_button.configure(text = "No guessing: %s" % ("On" if self.no_guess else "Off"))
+        if self.no_guess:
+            self._fill_board_pool()
+        else:
+            self.scheduler.cancel(self.fill_task)
+
+
+
+
     def _on_menu_select(self, buttonid):
         """
         Listens for button press and starts the game
         """
+        difficulty = self.difficulties[buttonid]
+        if difficulty == "Custom":
+            self._ask_custom_size()
+        else:
+            self._start_game(*PRESETS[difficulty], difficulty = difficulty)
+
+
+
+
+    def _ask_custom_size(self):
+        """
+        Ask for a width, height and mine count and start that game
+        A size that doesn't fit says why and asks again; cancelling stays on the menu
+        """
+        from tkinter import messagebox, simpledialog
+        answer = "%d %d %d" % (self.board_tile_width, self.board_tile_height, self.mine_number)
+        while True:
+            answer = simpledialog.askstring("Custom board", "Width, height and mines:", initialvalue = answer, parent = self.root)
+            if answer is None:
+                return
+            try:
+                self._start_game(*parse_size(answer.replace(",", " ").split()))
+                return
+            except ValueError as error:
+                messagebox.showerror("Custom board", str(error), parent = self.root)
+
+
+
+
+    def _plan_board(self, width, height, mine_number):
+        """
+        Check a board size against the budgets; returns (engine, renderer) to play it with
+        Raises ValueError for sizes that make no sense or don't fit in memory_budget
+        (on the chosen engine itself when auto_setup is off)
+        """
+        engine = choose_engine(width, height, mine_number, self.engine, self.memory_budget, switch = self.auto_setup)
+        if not self.auto_setup:
+            return engine, self.renderer
+        renderer = self.renderer
+        if renderer == "tiles" and width * height > self.item_budget:
+            renderer = "image"
+        tile_length = self.board_pixel_height / height
+        if tile_length < self.min_tile_length or tile_length * width > self.root.winfo_screenwidth() - 100:
+            renderer = "viewport"
+        return engine, renderer
+
 
-        # Clear start menu
-        self.menu_active = False
-        self.canvas.delete("all")
+
+
+    def _start_game(self, width, height, mine_number, difficulty = None):
+        """
+        Leave the menu and set up a board; difficulty names the preset, if it is one
+        Raises ValueError, leaving the menu up, if the size doesn't fit (see _plan_board)
+        """
+        self.game_engine, self.game_renderer = self._plan_board(width, height, mine_number)
+
+
+        # Clear start menu; sound gets ready now so the end screen doesn't wait for it
+        self.scheduler.cancel(self.dance_task)
+        self.canvas.delete("!cell && !hud") # The HUD keeps running into the game
         for button in self.buttons:
             button.destroy()
+        self.audio.start()
 
-
-        # Buttonid tells which is pressed
-        if buttonid == 0: # Easy
-            self.board_tile_width = 10
-            self.board_tile_height = 8
-            self.mine_number = 10
-        elif buttonid == 1: # Medium
-            self.board_tile_width = 18
-            self.board_tile_height = 14
-            self.mine_number = 40
-        elif buttonid == 2: # Hard
-            self.board_tile_width = 24
-            self.board_tile_height = 20
-            self.mine_number = 99
+        self.difficulty = difficulty
+        self.board_tile_width, self.board_tile_height, self.mine_number = width, height, mine_number
 
 
         # Sizes need to change based on the new amount of tiles
+        # A viewport keeps tiles big enough to click and scrolls instead
         self.tile_length = self.board_pixel_height / self.board_tile_height
         self.board_pixel_width = self.tile_length * self.board_tile_width
+        if self.game_renderer != "tiles":
+            from render import BoardImage, BoardViewport
+        if self.game_renderer == "viewport":
+            self.tile_length = max(self.tile_length, BoardViewport.min_tile_length * 4)
+            self.board_pixel_width = min(self.tile_length * self.board_tile_width, self.root.winfo_screenwidth() - 100)
         self.canvas.configure(width = self.board_pixel_width)
         self.root.geometry("%dx%d" % (self.board_pixel_width, self.board_pixel_height))
 
 
-        # Generate the minefield, a 2D array of Tile objects
-        self.minefield = [[Tile(self.canvas, self.tile_length, row, col) for col in range(self.board_tile_width)] for row in range(self.board_tile_height)]
-        self.tiles_cleared = 0
+        # Generate the game state and what draws it: either the minefield, a 2D array
+        # of Tile objects reused from earlier games, or a single board image for very large boards
+        # Every game has a seed, so its replay can rebuild the same mines
+        self.board = make_board(self.board_tile_width, self.board_tile_height, self.mine_number, self.game_engine,
+            seed = r.getrandbits(32))
+        if self.game_renderer == "image":
+            self.board_image = BoardImage(self.canvas, self.board, self.tile_length)
+            self.minefield = None
+        elif self.game_renderer == "viewport":
+            self.board_image = BoardViewport(self.canvas, self.board, self.board_pixel_width, self.board_pixel_height, self.tile_length)
+            self.minefield = None
+        else:
+            from render import tile_sprites
+            Tile.sprites = tile_sprites(self.tile_length)
+            self.board_image = None
+            self.minefield = self._pool_tiles()
+        self.phase = "first_click"
+
 
 
-        # Creates invisible rectangle to intercept first click
-        self.first_click_detector_id = self.canvas.create_rectangle(
-            0, 0, self.board_pixel_width, self.board_pixel_height,
-            fill = "",
-            outline = "",
-            tags = "first_click_setup")
+
+    def _pool_tiles(self):
+        """
+        Tiles for a new board, keeping the canvas items of the last Tile board
+        Kept items are reset and rescaled with a few tag-wide calls at any size;
+        only rows and columns the last board didn't have are created, and ones
+        past the new size are deleted in a single call
+        """
+        width, height = self.board_tile_width, self.board_tile_height
+        pool = self.tile_pool
+        extra = [tile.tile_id for row in pool[height:] for tile in row] + \
+            [tile.tile_id for row in pool[:height] for tile in row[width:]]
+        if extra:
+            self.canvas.delete(*extra)
+        del pool[height:]
+        for row in pool:
+            del row[width:]
+
+
+        # Back to covered, at the new tile size
+        if pool:
+            old_length = pool[0][0].length
+            if old_length != self.tile_length:
+                self.canvas.scale("cell", 0, 0, self.tile_length / old_length, self.tile_length / old_length)
+            self.canvas.dtag("cell", "cleared")
+            for color_number in range(len(self.mine_reveal_colors)):
+                self.canvas.dtag("cell", "mine%d" % color_number)
+            self.canvas.addtag_withtag("covered", "cell")
+            for shade, (fill, activefill) in Tile.covered_colors.items():
+                self.canvas.itemconfig(shade, fill = fill, activefill = activefill, state = "normal")
+            for row in pool:
+                for tile in row:
+                    tile.reuse(self.tile_length)
+
+
+        # New rows and columns
+        for row_number in range(height):
+            if row_number == len(pool):
+                pool.append([])
+            row = pool[row_number]
+            row.extend(Tile(self.canvas, self.tile_length, row_number, col) for col in range(len(row), width))
+        return pool
 
 
 
@@ -207,72 +392,215 @@ class Minesweeper(tk.Frame):
 
 
         # Figure out tile first click corresponds to
-        first_tile_col = math.floor(event.x / self.tile_length)
-        first_tile_row = math.floor(event.y / self.tile_length)
-        first_tile = self.minefield[first_tile_row][first_tile_col]
-
-
-        # Distribute mines, ensuring not within 1 tile radius of cursor
-        for mine_num in range(self.mine_number):
-            mine_tile = first_tile
-            while ((first_tile_col - 2 < mine_tile.col < first_tile_col + 2) and \
-                    (first_tile_row - 2 < mine_tile.row < first_tile_row + 2)) or \
-                    mine_tile.type == "mine":
-                mine_tile = r.choice(r.choice(self.minefield))
-            mine_tile.type = "mine"
-
-            # Update numbers for all tiles around mine
-            for neighbor in self._get_neighbors(mine_tile):
-                if neighbor.type != "mine":
-                    neighbor.mines_near += 1
-                    neighbor.type = "near_mine"
-
-
-        # Begin the game
-        self.canvas.delete(self.first_click_detector_id)
-        self._clear_tiles(first_tile)
+        first_tile_index = self._tile_index_at(event)
+
+
+        # Distribute mines, ensuring not within 1 tile radius of cursor (less if the
+        # board is packed too tight for that around this click)
+        # No-guess layouts come from the pool (as a seed and the tile they were
+        # made around), which tops itself back up once the game is over. A click
+        # the pool can't answer yet, and custom sizes small enough to try, get a
+        # short search here; everything else (including a search that runs out
+        # of time) is dealt at random
+        placement = first_tile_index
+        self.board.safe_radius = fitting_safe_radius(self.board_tile_width, self.board_tile_height,
+            self.mine_number, first_tile_index, self.board.safe_radius)
+        try:
+            if self.no_guess and self.difficulty:
+                self._fill_board_pool()
+                self.board.seed, placement = self.board_pool.get(self.difficulty, first_tile_index,
+                    max_seconds = self.no_guess_seconds)
+            elif self.no_guess and self.board.size <= self.no_guess_max_tiles:
+                from generator import generate_no_guess
+                self.board.seed, placement = generate_no_guess(self.board_tile_width, self.board_tile_height,
+                    self.mine_number, first_tile_index, max_seconds = self.no_guess_seconds)[:2]
+        except ValueError:
+            pass
+        started = perf.start()
+        self.board.place_mines(placement)
+        perf.stop("place_mines", started)
+        self.recorder = Recorder(self.board_tile_width, self.board_tile_height, self.mine_number,
+            self.board.seed, placement, self.board.safe_radius)
+        self.recorder.record(first_tile_index, REVEAL)
+        if self.minefield:
+            self.mine_task = self.scheduler.start(self._tag_mines())
+
+
+        # Begin the game, adding a timer to the title
+        # Timer starts first so a win on the very first click can stop it
+        self.phase = "playing"
         self.start_time = time.time()
+        self.timer_task = self.scheduler.start(self._timer())
+        self._clear_tiles(first_tile_index)
+
+
+
+
+    def _tag_mines(self):
+        """
+        Scheduler task: give each mine's Tile a color tag and a hidden dot, a slice of
+        the board per step, so the end screen can show every mine with a few tag-wide calls
+        """
+        colors = list(self.mine_reveal_colors)
+        mines = self.board.mines
+        for start in range(0, self.board.size, 10000):
+            for index in range(start, min(start + 10000, self.board.size)):
+                if not mines[index]:
+                    continue
+                tile = self.minefield[index // self.board_tile_width][index % self.board_tile_width]
+                color_number = r.randrange(len(colors))
+                self.canvas.addtag_withtag("mine%d" % color_number, tile.tile_id)
+                pad = tile.length * 0.3
+                self.canvas.create_oval(
+                    tile.x + pad, tile.y + pad,
+                    tile.x + tile.length - pad, tile.y + tile.length - pad,
+                    outline = "",
+                    fill = self.mine_reveal_colors[colors[color_number]],
+                    state = "hidden",
+                    tags = "mine_dot")
+            yield 0
+
+
+
+
+    def _fill_board_pool(self):
+        """
+        Start pre-generating no-guess layouts unless that's already running
+        """
+        if self.board_pool is None:
+            from generator import BoardPool
+            self.board_pool = BoardPool()
+        if not self.scheduler.is_running(self.fill_task):
+            self.fill_task = self.scheduler.start(self._fill_between_games())
+
+
 
 
-        # Add timer to title
-        self.game_running = True
-        threading.Thread(target = self._timer, daemon = True).start()
+    def _fill_between_games(self):
+        """
+        Scheduler task: the pool's fill, paused while a game is being played, since
+        a solver attempt can take longer than a frame
+        """
+        steps = self.board_pool.fill()
+        while True:
+            while self.phase == "playing":
+                yield 0.25
+            delay = next(steps, None)
+            if delay is None:
+                return
+            yield delay
 
 
 
 
     def _timer(self):
         counter = 1
-        while self.game_running:
+        while True:
             self.root.title("%d seconds" % counter)
             counter += 1
-            time.sleep(1)
+            yield 1
+
+
+
+
+    def _on_click(self, event):
+        """
+        Every canvas click comes through here and is routed by game phase
+        Mouse position maps straight to a tile, so Tk never hit tests canvas items
+        """
+        started = perf.start()
+        if self.phase == "playing":
+            self._on_tile_click(event)
+        elif self.phase == "first_click":
+            if event.num == 1:
+                self._on_first_click(event)
+        elif self.phase == "end":
+            self._start_menu(event)
+        perf.stop("click", started)
+
+
+
+
+    def _toggle_hud(self, event):
+        self.show_hud = not self.show_hud
+        if self.show_hud:
+            perf.enable()
+            self.hud_task = self.scheduler.start(self._hud())
+        else:
+            self.scheduler.cancel(self.hud_task)
+            self.canvas.delete("hud")
+
+
+
+
+    def _hud(self):
+        """
+        Scheduler task: frame time, input latency and canvas item count in the
+        top left corner, refreshed twice a second
+        """
+        self.canvas.delete("hud")
+        text_id = self.canvas.create_text(4, 4, anchor = "nw", font = ("Consolas", 10), fill = "black", tags = "hud")
+        while True:
+            lines = []
+            for name, label in (("frame", "frame"), ("click", "input")):
+                histogram = perf.histograms.get(name)
+                if histogram:
+                    summary = histogram.summary()
+                    lines.append("%s %.2f ms (p99 %.2f)" % (label, summary["mean_ms"], summary["p99_ms"]))
+                else:
+                    lines.append("%s -" % label)
+            lines.append("items %d" % (len(self.canvas.find_all()) - 1))
+            self.canvas.itemconfig(text_id, text = "\n".join(lines))
+            self.canvas.tag_raise(text_id)
+            yield 0.5
+
+
+
+
+    def _tile_index_at(self, event):
+        """
+        Index of the tile under the mouse
+        """
+        if self.board_image:
+            return self.board_image.tile_at(event.x, event.y)
+        row = min(max(math.floor(event.y / self.tile_length), 0), self.board_tile_height - 1)
+        col = min(max(math.floor(event.x / self.tile_length), 0), self.board_tile_width - 1)
+        return row * self.board_tile_width + col
 
 
 
 
-    def _get_neighbors(self, tile):
+    def _on_scroll(self, event):
         """
-        Find the 8 tiles around a given tile
+        Mouse wheel scrolls the viewport; with Ctrl held it zooms around the mouse
         """
+        if self.game_renderer != "viewport" or not getattr(self, "board_image", None):
+            return
+        steps = 1 if event.num == 4 or event.delta > 0 else -1
+        if event.state & 0x0004: # Ctrl
+            self.board_image.zoom(1.25 if steps > 0 else 0.8, event.x, event.y)
+        elif event.state & 0x0001: # Shift scrolls sideways
+            self.board_image.scroll_by(-steps * self.board_image.tile_length * 3, 0)
+        else:
+            self.board_image.scroll_by(0, -steps * self.board_image.tile_length * 3)
+
+
 
 
-        # Find tiles
-        neighbor_coords = [
-            [tile.row - 1, tile.col], [tile.row - 1, tile.col - 1], [tile.row - 1, tile.col + 1],
-            [tile.row + 1, tile.col], [tile.row + 1, tile.col - 1], [tile.row + 1, tile.col + 1], 
-            [tile.row, tile.col + 1], [tile.row, tile.col - 1]]
+    def _on_drag_start(self, event):
+        self.drag_position = (event.x, event.y)
 
 
-        # Remove ones that fall outside window
-        final_tileset = []
-        for coord_pair in neighbor_coords:
-            if -1 not in coord_pair                        and \
-                self.board_tile_width != coord_pair[1]     and \
-                self.board_tile_height != coord_pair[0]:
 
-                final_tileset.append(self.minefield[coord_pair[0]][coord_pair[1]])
-        return final_tileset
+
+    def _on_drag(self, event):
+        """
+        Middle mouse drag pans the viewport
+        """
+        if self.game_renderer != "viewport" or not getattr(self, "board_image", None):
+            return
+        self.board_image.scroll_by(self.drag_position[0] - event.x, self.drag_position[1] - event.y)
+        self.drag_position = (event.x, event.y)
 
 
 
@@ -284,88 +612,119 @@ class Minesweeper(tk.Frame):
 
         
         # Find clicked tile        
-        tile_column = math.floor(event.x / self.tile_length)
-        tile_row = math.floor(event.y / self.tile_length)
-        tile = self.minefield[tile_row][tile_column]
+        tile_index = self._tile_index_at(event)
+        tile_row, tile_column = divmod(tile_index, self.board_tile_width)
 
 
         # Left click
-        if event.num == 1 and tile.state == tk.NORMAL and not tile.has_flag:
-            if tile.type != "mine":
-                self._clear_tiles(tile)
+        if event.num == 1 and not self.board.revealed[tile_index] and not self.board.flagged[tile_index]:
+            self.recorder.record(tile_index, REVEAL)
+            if not self.board.mines[tile_index]:
+                self._clear_tiles(tile_index)
                 self.canvas.pack() # Reload visual changes
             else:
                 self._display_end_screen("loss")
+
+
+        # Left click on a number whose mines are all flagged opens the rest around it
+        elif event.num == 1 and self.board.revealed[tile_index] and self.board.mines_near[tile_index]:
+            self.recorder.record(tile_index, CHORD)
+            started = perf.start()
+            cleared = self.board.chord(tile_index)
+            perf.stop("reveal", started)
+            if self.board.lost:
+                self._display_end_screen("loss")
+            elif cleared:
+                self._draw_and_check(cleared)
         
 
         # Right click
-        elif event.num == 3 and tile.state == tk.NORMAL:
-            if tile.has_flag:
-                tile.deflag()
+        elif event.num == 3 and not self.board.revealed[tile_index]:
+            self.recorder.record(tile_index, FLAG)
+            has_flag = self.board.toggle_flag(tile_index)
+            if self.board_image:
+                self.board_image.set_flag(tile_index)
+            elif has_flag: # Flags on mines go when the mines are shown
+                self.minefield[tile_row][tile_column].flag(("mine_flag",) if self.board.mines[tile_index] else ())
             else:
-                tile.flag()
+                self.minefield[tile_row][tile_column].deflag()
 
 
 
 
-    def _clear_tiles(self, tile):
+    def _clear_tiles(self, index):
         """
-        Recursive algorithm to clear tiles; stops on numbered tiles
+        Reveals tiles on the board and redraws the ones that were cleared
         """
+        started = perf.start()
+        cleared = self.board.reveal(index)
+        perf.stop("reveal", started)
+        self._draw_and_check(cleared)
+
 
 
-        # Update tiles
-        tile.clear()
-        self.tiles_cleared += 1
-        
 
-        # Spread to all nearby tiles if current isn't numbered
-        # if current numbered add borders
-        if tile.type != "near_mine":
-            for neighbor in self._get_neighbors(tile):
-                if neighbor.state == tk.NORMAL and not neighbor.has_flag:
-                    self._clear_tiles(neighbor)
+    def _draw_and_check(self, cleared):
+        """
+        One render pass over everything a click cleared, then check for a win
+        """
+        started = perf.start()
+        if self.board_image:
+            self.board_image.clear_tiles(cleared)
         else:
-            for neighbor in self._get_neighbors(tile):
-                if neighbor.state == tk.NORMAL:
-                    xdiff = neighbor.col - tile.col
-                    ydiff = neighbor.row - tile.row
-                    direction = None
-                    
-                    if 0 in [xdiff, ydiff]:
-                        if xdiff == 1:
-                            direction = "W"
-                        elif xdiff == -1:
-                            direction = "E"
-
-                        if ydiff == 1:
-                            direction = "N"
-                        elif ydiff == -1:
-                            direction = "S"
-                        neighbor.create_border(direction)
+            self._draw_cleared(cleared)
+        perf.stop("render", started)
 
 
         # Check for win
-        if self.tiles_cleared == self.board_tile_height * self.board_tile_width - self.mine_number:
+        if self.board.is_won():
             self._display_end_screen("win")
 
 
 
 
+    def _draw_cleared(self, cleared):
+        """
+        Redraws cleared Tiles; numbered ones get borders on the covered tiles beside them
+        """
+        for tile_index in cleared:
+            tile_row, tile_col = divmod(tile_index, self.board_tile_width)
+            self.minefield[tile_row][tile_col].clear(self.board.mines_near[tile_index])
+
+        for tile_index in cleared:
+            if self.board.mines_near[tile_index] == 0:
+                continue
+            tile_row, tile_col = divmod(tile_index, self.board_tile_width)
+            for row_diff, col_diff, direction in ((1, 0, "N"), (-1, 0, "S"), (0, 1, "W"), (0, -1, "E")):
+                neighbor_row = tile_row + row_diff
+                neighbor_col = tile_col + col_diff
+                if 0 <= neighbor_row < self.board.height and 0 <= neighbor_col < self.board.width and \
+                        not self.board.revealed[neighbor_row * self.board_tile_width + neighbor_col]:
+                    self.minefield[neighbor_row][neighbor_col].create_border(direction)
+
+
+
+
     def _display_end_screen(self, result):
         """
-        Start the threads for end audio and animation
+        Start the end audio and animation
         """
+        self.phase = "over"
 
 
         end_screen = self.canvas.create_image(
             self.board_pixel_width / 2, self.board_pixel_height / 2, 
             anchor = "center", 
-            image = self.lose_screen if result == "loss" else self.win_screen)
-        threading.Thread(target = playsound, args = ("boing.wav",), daemon = True).start()
-        threading.Thread(target = self._end_animation, args = (end_screen,), daemon = True).start()
-
-        self.game_running = False
+            image = self._end_screen_image(result))
+        self.audio.play("boing")
+        self.scheduler.start(self._end_animation(end_screen))
+
+        self.scheduler.cancel(self.timer_task)
+        try:
+            if self.save_replays:
+                self.recorder.save()
+        except OSError:
+            pass # Replays are a bonus; a read-only install just doesn't keep them
         if result == "win":
             score = "Final Score: %d seconds" % round(time.time() - self.start_time, 2)
             self.root.title(score)
@@ -374,67 +733,84 @@ class Minesweeper(tk.Frame):
 
 
 
+    def _end_screen_image(self, result):
+        """
+        Red mochi for a loss, green for a win
+        """
+        if result not in self.end_screens:
+            import assets
+            from PIL import ImageTk
+            path = "funnybunny_red.jpg" if result == "loss" else "funnybunny_green.jpg"
+            self.end_screens[result] = ImageTk.PhotoImage(assets.load_image(path, self.end_screen_size))
+        return self.end_screens[result]
+
+
+
+
     def _end_animation(self, img):
         """
         Mochi appears & slides off the screen; mines revealed
         """
-        time.sleep(0.75)
+        yield 0.75
 
 
-        # Disable input
-        for row in self.minefield:
-            for tile in row:
-                self.canvas.itemconfig(tile.tile_id, tags = "", activefill = "")
+        # Input is already off (phase is "over"); covered tiles stop lighting up too
+        if self.minefield:
+            self.canvas.itemconfig("covered", activefill = "")
 
 
-        # Image slides off screen in random direction
-        img_x = 0
-        img_y = 0
+        # Image slides off screen in random direction, speeding up every 5 ms
+        # Position comes from elapsed time so the slide takes as long at any frame rate
         x_shift = r.choice([-0.5, 0, 0.5])
         y_shift = r.choice([-0.5, 0, 0.5]) if x_shift != 0 else r.choice([-0.5, 0.5])
-        for move in range(int(self.board_pixel_width / 15)):
-            self.canvas.move(img, img_x, img_y)
-            img_x += x_shift
-            img_y += y_shift
-            time.sleep(0.005)
+        moves = int(self.board_pixel_width / 15)
+        slide_start = time.monotonic()
+        move = 0
+        while move < moves:
+            move = min((time.monotonic() - slide_start) / 0.005, moves)
+            distance = move * (move - 1) / 2 if move > 1 else 0
+            started = perf.start()
+            self.canvas.coords(img, self.board_pixel_width / 2 + x_shift * distance, self.board_pixel_height / 2 + y_shift * distance)
+            perf.stop("end_animation", started)
+            yield 0
 
 
         # Rainbow color mines
-        for row in self.minefield:
-            for tile in row:
-                pad = tile.length * 0.3
-                if tile.type == "mine":
-                    tile.deflag()
-                    c = r.choice(list(self.mine_reveal_colors))
-                    self.canvas.itemconfig(tile.tile_id, fill = c)
-                    self.canvas.create_oval(
-                        tile.x + pad, tile.y + pad,
-                        tile.x + tile.length - pad, tile.y + tile.length - pad,
-                        outline = "",
-                        fill = self.mine_reveal_colors[c])
-        
+        # Tiles were sorted into color tags with hidden dots ahead of time
+        # (see _tag_mines), so this is a handful of tag-wide calls at any size
+        while self.scheduler.is_running(self.mine_task):
+            yield 0
+        started = perf.start()
+        if self.board_image:
+            self.board_image.reveal_mines(self.mine_reveal_colors)
+        else:
+            self.canvas.delete("mine_flag")
+            for color_number, color in enumerate(self.mine_reveal_colors):
+                self.canvas.itemconfig("mine%d" % color_number, fill = color)
+            self.canvas.itemconfig("mine_dot", state = "normal")
+        perf.stop("reveal_mines", started)
+
 
-        # Get back to main menu
-        self.root.bind("<Button>", self._start_menu)
+        # Next click goes back to the main menu
+        self.phase = "end"
 
 
 
 
 class Tile(object):
 
+    # Only what's needed to draw; no per-tile __dict__ on big boards
+    __slots__ = ("canvas", "row", "col", "length", "x", "y", "light", "shade", "text_id", "tile_id", "flag_id", "borders")
 
 
+    # Covered (fill, mouse-over fill) by shade; each shade is also a tag on its
+    # Tiles, so a pooled board is recolored with one call per shade
+    covered_colors = {"light": ("#AAD751", "#BFE17D"), "dark": ("#A2D149", "#B9DD77")}
 
-    number_colors = [
-            "#1976D2", # Blue
-            "#388E3C", # Green
-            "#D32F2F", # Red
-            "#7B1FA2", # Purple
-            "#FF8F00", # Gold
-            "#0097A7", # Aqua
-            "#424242", # Black
-            "#9E9E9E"] # Silver
 
+    # render.tile_sprites for the current tile size, set when a game starts
+    # Every flag and number is one image item showing one of these
+    sprites = None
 
 
 
@@ -447,66 +823,70 @@ class Tile(object):
         self.y = self.row * self.length
 
 
-        # Type can be blank, near_mine, or mine; type never changes
-        # State is if a tile is "covered" or not
-        self.type = "blank"
-        self.state = tk.NORMAL
-
-
-        # Miscallaneous
-        self.tone = "light" if (self.row + self.col) % 2 == 0 else "dark"
-        self.mines_near = 0
+        # Game state (mines, numbers, covered or not) lives on the engine Board
+        # Tiles only know how to draw themselves
+        self.light = (self.row + self.col) % 2 == 0
+        self.shade = "light" if self.light else "dark"
         self.text_id = None
 
 
-        # Tile components
-        self.font = ('Helvetica', int(self.length / 2), 'bold')
-
-        self.flag_parts = []
-        self.has_flag = False
-
-        self.border_width = self.length * 0.1
-        self.borders = []
+        # Tile components; nothing until the tile actually gets a flag or borders
+        self.flag_id = None
+        self.borders = ()
 
         
-        # Build final canvas object
+        # Build final canvas object; "cell" marks it as pooled (see Minesweeper._pool_tiles)
+        fill, activefill = Tile.covered_colors[self.shade]
         self.tile_id = self.canvas.create_rectangle(
             self.x, self.y,
             self.x + self.length, self.y + self.length,
-            fill = "#AAD751" if self.tone == "light" else "#A2D149",
-            activefill = "#BFE17D" if self.tone == "light" else "#B9DD77",
+            fill = fill,
+            activefill = activefill,
             outline = "",
-            tags = ["clickable"],
+            tags = ("cell", self.shade, "covered"),
         )
 
 
 
 
-    def clear(self):
+    def reuse(self, length):
+        """
+        Start a new game at a new tile size; the last game's numbers, flags and borders
+        are already deleted, and the rectangle is reset by tag-wide calls
+        """
+        self.length = length
+        self.x = self.col * length
+        self.y = self.row * length
+        self.text_id = None
+        self.flag_id = None
+        self.borders = ()
+
+
+
+
+    def clear(self, mines_near):
         """
-        Updates tile color, state, and borders on clear
+        Updates tile color, number, and borders on clear
         """
 
 
         # Color from green to brown
-        self.canvas.itemconfig(self.tile_id, activefill = "", fill = "#E5C29F" if self.tone == "light" else "#D7B899")
+        self.canvas.itemconfig(self.tile_id, activefill = "", fill = "#E5C29F" if self.light else "#D7B899",
+            tags = ("cell", self.shade, "cleared"))
 
 
         # Clear borders
         for border in self.borders:
             self.canvas.delete(border)
-        self.borders = []
+        self.borders = ()
 
 
-        # Create text for tiles near mines
-        if self.type == "near_mine":
-            self.text_id = self.canvas.create_text(
-                self.x + self.length / 2, self.y + self.length / 2, 
-                text = str(self.mines_near),
-                fill = Tile.number_colors[self.mines_near - 1],
-                font = self.font)
-
-        self.state = tk.DISABLED
+        # Number sprite for tiles near mines
+        if mines_near > 0:
+            self.text_id = self.canvas.create_image(
+                self.x + self.length / 2, self.y + self.length / 2,
+                image = Tile.sprites[mines_near],
+                tags = "numbered")
 
 
 
@@ -517,65 +897,30 @@ class Tile(object):
         """
 
 
-        x1 = self.x + ((self.length + self.border_width) if side == "E" else 0)
-        y1 = self.y + ((self.length + self.border_width) if side == "S" else 0)
+        border_width = self.length * 0.1
+        x1 = self.x + ((self.length + border_width) if side == "E" else 0)
+        y1 = self.y + ((self.length + border_width) if side == "S" else 0)
 
-        x2 = self.x - (self.border_width if side == "W" else -1 * self.length)
-        y2 = self.y - (self.border_width if side == "N" else -1 * self.length)
+        x2 = self.x - (border_width if side == "W" else -1 * self.length)
+        y2 = self.y - (border_width if side == "N" else -1 * self.length)
 
-        self.borders.append(self.canvas.create_rectangle(
+        self.borders += (self.canvas.create_rectangle(
             x1, y1,
             x2, y2,
             outline = "",
-            fill = "#8FB044"))
+            fill = "#8FB044"),)
 
 
 
 
-    def flag(self):
+    def flag(self, tags = ()):
         """
-        Creates a flag for the tile
-        The numbers are very fine tuned
+        Puts the flag sprite on the tile, with any extra canvas tags
         """
-
-
-        # Flagpole
-        pole_x = self.x + self.length * 0.35
-        pole_y = self.y + self.length * 0.20
-        pole_width = self.length * 0.08
-        pole_height = self.length * 0.55
-        flag_pole = self.canvas.create_rectangle(
-            pole_x, pole_y,
-            pole_x + pole_width, pole_y + pole_height,
-            fill = "red", outline = "")
-
-
-        # Flag cloth
-        cloth_tip_x = pole_x + self.length * 0.4
-        cloth_tip_y = pole_y + self.length * 0.1
-        cloth_base_y = pole_y + self.length * 0.25
-        cloth_points = [pole_x + pole_width, pole_y, 
-        cloth_tip_x, cloth_tip_y, 
-        pole_x + pole_width, cloth_base_y]
-        flag_cloth = self.canvas.create_polygon(
-            cloth_points,
-            fill = "red", outline = "")
-
-
-        # Flag base
-        base_x_offset = pole_width * 0.5
-        base_y_offset = pole_height * 0.3
-        flag_base = self.canvas.create_arc(
-            pole_x - base_x_offset, pole_y + pole_height * 0.9,
-            pole_x + pole_width + base_x_offset, pole_y + pole_height + base_y_offset,
-            extent = 180, fill = "red", outline = "")
-
-
-        # Build flag and stop it from blocking click
-        self.flag_parts = [flag_pole, flag_cloth, flag_base]
-        for flag_part in self.flag_parts:
-            self.canvas.itemconfig(flag_part, tags = ["clickable"])
-        self.has_flag = True
+        self.flag_id = self.canvas.create_image(
+            self.x + self.length / 2, self.y + self.length / 2,
+            image = Tile.sprites["flag"],
+            tags = ("flag",) + tuple(tags))
 
 
 
@@ -584,17 +929,31 @@ class Tile(object):
         """
         Remove flag from tile
         """
-
-
-        for flag_part in self.flag_parts:
-            self.canvas.delete(flag_part)
-        self.flag_parts.clear()
-        self.has_flag = False
+        self.canvas.delete(self.flag_id)
+        self.flag_id = None
 
 
 
 
 if __name__ == "__main__":
+    # python3 main.py simulate Hard --games 100000 plays headless games instead (see simulate.py)
+    if sys.argv[1:2] == ["simulate"]:
+        import simulate
+        simulate.main(sys.argv[2:])
+        sys.exit()
+
+
+    # python3 main.py Hard, or python3 main.py 2000 2000 800000, skips the menu
+    # --no-guess only deals boards that can be solved without guessing
+    no_guess = "--no-guess" in sys.argv
+    words = [word for word in sys.argv[1:] if word != "--no-guess"]
+    size = None
+    if words:
+        try:
+            size = parse_size(words)
+        except ValueError as error:
+            sys.exit(str(error))
+
     root = tk.Tk()
 
 
@@ -602,6 +961,13 @@ if __name__ == "__main__":
     minesweeper = Minesweeper(root, root.winfo_screenheight() - 100)
     minesweeper.pack(fill="both", expand=True)
     minesweeper.canvas.pack()
+    if no_guess:
+        minesweeper._toggle_no_guess()
+    if size:
+        try:
+            minesweeper._start_game(*size, difficulty = words[0] if words[0] in PRESETS else None)
+        except ValueError as error:
+            sys.exit(str(error))
 
 
     # Center/config the window and begin the game
@@ -0,0 +1,128 @@
+import atexit
+import json
+import os
+import time
+
+
+
+
+# Optional timing hooks for the hot paths, left in place all the time:
+#
+#     started = perf.start()
+#     ...work...
+#     perf.stop("reveal", started)
+#
+# While disabled, start returns 0 and stop returns straight away, so a hook
+# costs two cheap calls. Turn them on with MINESWEEPER_PERF=1 or the F3 HUD;
+# results are written to perf.json when the game exits
+
+EXPORT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "perf.json")
+
+enabled = False
+histograms = {} # Operation name -> Histogram
+_export_registered = False
+
+
+
+
+class Histogram(object):
+    """
+    Durations bucketed by power of two nanoseconds, so adding one is O(1) and
+    the memory use is fixed no matter how long the game runs
+    """
+    __slots__ = ("count", "total", "largest", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.largest = 0
+        self.buckets = [0] * 64 # Bucket b holds durations under 2 ** b ns
+
+
+    def add(self, nanoseconds):
+        self.count += 1
+        self.total += nanoseconds
+        if nanoseconds > self.largest:
+            self.largest = nanoseconds
+        self.buckets[nanoseconds.bit_length()] += 1
+
+
+    def percentile(self, fraction):
+        """
+        Upper bound, in nanoseconds, of the bucket holding that fraction of durations
+        """
+        target = fraction * self.count
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= target:
+                return min(2 ** bucket, self.largest)
+        return 0
+
+
+    def summary(self):
+        """
+        Milliseconds, plus the raw bucket counts keyed by their upper bound in ns
+        """
+        return {
+            "count": self.count,
+            "mean_ms": self.total / max(self.count, 1) / 1e6,
+            "p50_ms": self.percentile(0.5) / 1e6,
+            "p90_ms": self.percentile(0.9) / 1e6,
+            "p99_ms": self.percentile(0.99) / 1e6,
+            "max_ms": self.largest / 1e6,
+            "buckets": {2 ** bucket: count for bucket, count in enumerate(self.buckets) if count},
+        }
+
+
+
+
+def start():
+    return time.perf_counter_ns() if enabled else 0
+
+
+
+
+def stop(name, started):
+    """
+    Add the time since start() to name's histogram; does nothing if start() was disabled
+    """
+    if not started:
+        return
+    elapsed = time.perf_counter_ns() - started
+    histogram = histograms.get(name)
+    if histogram is None:
+        histogram = histograms[name] = Histogram()
+    histogram.add(elapsed)
+
+
+
+
+def enable(on = True):
+    """
+    Turn the hooks on or off; the first time they're on, results get exported at exit
+    """
+    global enabled, _export_registered
+    enabled = on
+    if on and not _export_registered:
+        atexit.register(export)
+        _export_registered = True
+
+
+
+
+def summaries():
+    return {name: histogram.summary() for name, histogram in sorted(histograms.items())}
+
+
+
+
+def export(path = EXPORT_PATH):
+    with open(path, "w") as export_file:
+        json.dump(summaries(), export_file, indent = 2)
+
+
+
+
+if os.environ.get("MINESWEEPER_PERF") == "1":
+    enable()
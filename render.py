@@ -0,0 +1,471 @@
+import random as r
+from functools import lru_cache
+
+from PIL import Image, ImageDraw, ImageFont, ImageTk
+
+
+
+
+# Draws the whole board into one Pillow image shown through a single canvas item
+# Canvas rectangles per tile slow Tk to a crawl on very large boards; here a
+# reveal or flag only redraws the tiles it touched and copies that rectangle
+# into the displayed PhotoImage
+
+
+
+
+@lru_cache(maxsize = 8)
+def render_digits(length):
+    """
+    Masks of the numbers 1-8 centred in a tile, rendered once per size and pasted from then on
+    Bold TrueType font if one is around, Pillow's built in one if not
+    """
+    font = None
+    for name in ("arialbd.ttf", "DejaVuSans-Bold.ttf"):
+        try:
+            font = ImageFont.truetype(name, max(length // 2, 1))
+            break
+        except OSError:
+            pass
+    font = font or ImageFont.load_default()
+
+    masks = [None]
+    for number in range(1, 9):
+        mask = Image.new("L", (length, length), 0)
+        ImageDraw.Draw(mask).text((length / 2, length / 2), str(number), fill = 255, font = font, anchor = "mm")
+        masks.append(mask)
+    return masks
+
+
+
+
+def draw_flag(draw, x, y, length):
+    """
+    Same pole, cloth and base proportions as the old vector Tile flag
+    """
+    pole_x = x + length * 0.35
+    pole_y = y + length * 0.20
+    pole_width = length * 0.08
+    pole_height = length * 0.55
+    draw.rectangle((pole_x, pole_y, pole_x + pole_width, pole_y + pole_height), fill = "red")
+    draw.polygon([
+        (pole_x + pole_width, pole_y),
+        (pole_x + length * 0.4, pole_y + length * 0.1),
+        (pole_x + pole_width, pole_y + length * 0.25)], fill = "red")
+    base_x_offset = pole_width * 0.5
+    draw.pieslice((
+        pole_x - base_x_offset, pole_y + pole_height * 0.9,
+        pole_x + pole_width + base_x_offset, pole_y + pole_height * 1.3), 180, 360, fill = "red")
+
+
+
+
+@lru_cache(maxsize = 4)
+def tile_sprites(length):
+    """
+    PhotoImages for the Tile renderer, made once per tile size: "flag" and the numbers 1-8
+    Transparent around the drawing, so a single create_image puts one on any tile
+    """
+    length = max(int(length), 1)
+    sprites = {}
+    masks = render_digits(length)
+    for number in range(1, 9):
+        sprite = Image.new("RGBA", (length, length), (0, 0, 0, 0))
+        sprite.paste(BoardImage.number_colors[number - 1], (0, 0), masks[number])
+        sprites[number] = ImageTk.PhotoImage(sprite)
+
+    flag = Image.new("RGBA", (length, length), (0, 0, 0, 0))
+    draw_flag(ImageDraw.Draw(flag), 0, 0, length)
+    sprites["flag"] = ImageTk.PhotoImage(flag)
+    return sprites
+
+
+
+
+class BoardImage(object):
+
+    # Same palette as Tile; number colors are shared with its sprites
+    covered_colors = ("#AAD751", "#A2D149")
+    cleared_colors = ("#E5C29F", "#D7B899")
+    border_color = "#8FB044"
+    number_colors = [
+            "#1976D2", # Blue
+            "#388E3C", # Green
+            "#D32F2F", # Red
+            "#7B1FA2", # Purple
+            "#FF8F00", # Gold
+            "#0097A7", # Aqua
+            "#424242", # Black
+            "#9E9E9E"] # Silver
+
+
+
+
+    def __init__(self, canvas, board, tile_length):
+        self.canvas = canvas
+        self.board = board
+        self.tile_length = tile_length
+        self.pixel_width = max(int(tile_length * board.width), board.width)
+        self.pixel_height = max(int(tile_length * board.height), board.height)
+
+
+        # Covered checkerboard is one pixel per tile blown up, instead of drawing every tile
+        self.image = self._checkerboard(board.width, board.height, False).resize((self.pixel_width, self.pixel_height), Image.NEAREST)
+        self.draw = ImageDraw.Draw(self.image)
+        self.digit_masks = render_digits(max(int(tile_length), 1))
+
+
+        # Area that still needs copying to the screen, as (x1, y1, x2, y2)
+        self.dirty = None
+        self.mine_colors = None
+
+        self.photo = ImageTk.PhotoImage(self.image)
+        self.image_id = self.canvas.create_image(0, 0, anchor = "nw", image = self.photo)
+
+
+
+
+    def _checkerboard(self, cols, rows, odd):
+        """
+        Covered tile colors, one pixel per tile; odd means the top left tile is dark
+        """
+        row_bytes = (cols + 8) // 8
+        even_row = bytes([0b01010101]) * row_bytes
+        odd_row = bytes([0b10101010]) * row_bytes
+        mask = Image.frombytes("1", (row_bytes * 8, rows), b"".join(odd_row if row % 2 else even_row for row in range(rows)))
+        mask = mask.crop((1 if odd else 0, 0, cols + (1 if odd else 0), rows))
+
+        checkers = Image.new("RGB", (cols, rows), self.covered_colors[0])
+        checkers.paste(self.covered_colors[1], mask = mask)
+        return checkers
+
+
+
+
+    def tile_at(self, x, y):
+        """
+        Index of the tile under a canvas pixel
+        """
+        col = min(int(x * self.board.width / self.pixel_width), self.board.width - 1)
+        row = min(int(y * self.board.height / self.pixel_height), self.board.height - 1)
+        return row * self.board.width + col
+
+
+
+
+    def tile_box(self, index):
+        """
+        Pixel box (x1, y1, x2, y2) of a tile; x2 and y2 are exclusive
+        """
+        row, col = divmod(index, self.board.width)
+        return (
+            int(col * self.pixel_width / self.board.width), int(row * self.pixel_height / self.board.height),
+            int((col + 1) * self.pixel_width / self.board.width), int((row + 1) * self.pixel_height / self.board.height))
+
+
+
+
+    def draw_tile(self, index):
+        """
+        Repaint one tile from the board state and mark it dirty
+        """
+        board = self.board
+        row, col = divmod(index, board.width)
+        light = (row + col) % 2 == 0
+        x1, y1, x2, y2 = box = self.tile_box(index)
+
+        if board.revealed[index]:
+            self.draw.rectangle((x1, y1, x2 - 1, y2 - 1), fill = self.cleared_colors[0 if light else 1])
+            mines_near = board.mines_near[index]
+            if mines_near > 0:
+                self.image.paste(self.number_colors[mines_near - 1], (x1, y1), self.digit_masks[mines_near])
+                self._draw_borders(index, box)
+        else:
+            self.draw.rectangle((x1, y1, x2 - 1, y2 - 1), fill = self.covered_colors[0 if light else 1])
+            if board.flagged[index]:
+                draw_flag(self.draw, x1, y1, x2 - x1)
+
+        self._mark_dirty(box)
+
+
+
+
+    def _draw_borders(self, index, box):
+        """
+        Numbered tiles get a strip on each side that touches a covered tile
+        """
+        board = self.board
+        x1, y1, x2, y2 = box
+        border_width = max(int(self.tile_length * 0.1), 1)
+        row, col = divmod(index, board.width)
+        if row > 0 and not board.revealed[index - board.width]:
+            self.draw.rectangle((x1, y1, x2 - 1, y1 + border_width - 1), fill = self.border_color)
+        if row < board.height - 1 and not board.revealed[index + board.width]:
+            self.draw.rectangle((x1, y2 - border_width, x2 - 1, y2 - 1), fill = self.border_color)
+        if col > 0 and not board.revealed[index - 1]:
+            self.draw.rectangle((x1, y1, x1 + border_width - 1, y2 - 1), fill = self.border_color)
+        if col < board.width - 1 and not board.revealed[index + 1]:
+            self.draw.rectangle((x2 - border_width, y1, x2 - 1, y2 - 1), fill = self.border_color)
+
+
+
+
+    def _mark_dirty(self, box):
+        if self.dirty is None:
+            self.dirty = box
+        else:
+            self.dirty = (
+                min(self.dirty[0], box[0]), min(self.dirty[1], box[1]),
+                max(self.dirty[2], box[2]), max(self.dirty[3], box[3]))
+
+
+
+
+    def clear_tiles(self, cleared):
+        """
+        Draw newly cleared tiles; revealed tiles beside them may lose a border
+        """
+        board = self.board
+        redraw = set(cleared)
+        for index in cleared:
+            row, col = divmod(index, board.width)
+            if row > 0:
+                redraw.add(index - board.width)
+            if row < board.height - 1:
+                redraw.add(index + board.width)
+            if col > 0:
+                redraw.add(index - 1)
+            if col < board.width - 1:
+                redraw.add(index + 1)
+        for index in redraw:
+            if board.revealed[index]:
+                self.draw_tile(index)
+        self.flush()
+
+
+
+
+    def set_flag(self, index):
+        """
+        Redraw a tile after it is flagged or unflagged
+        """
+        self.draw_tile(index)
+        self.flush()
+
+
+
+
+    def reveal_mines(self, colors):
+        """
+        Rainbow color mines; colors maps tile fill to the fill of the dot on top
+        """
+        self._pick_mine_colors(colors)
+        board = self.board
+        for index in range(board.size):
+            if board.mines[index]:
+                self._draw_mine(index)
+        self.flush()
+
+
+
+
+    def _pick_mine_colors(self, colors):
+        """
+        Fix this game's mine colors: each mine's pair comes from hashing its index
+        with a seed drawn once here, so redrawing a mine never changes its color
+        """
+        self.mine_colors = list(colors.items())
+        self.mine_color_seed = r.getrandbits(32)
+
+
+
+
+    def _draw_mine(self, index):
+        x1, y1, x2, y2 = box = self.tile_box(index)
+        pad = (x2 - x1) * 0.3
+        fill, dot = self.mine_colors[hash((self.mine_color_seed, index)) % len(self.mine_colors)]
+        self.draw.rectangle((x1, y1, x2 - 1, y2 - 1), fill = fill)
+        self.draw.ellipse((x1 + pad, y1 + pad, x2 - pad, y2 - pad), fill = dot)
+        self._mark_dirty(box)
+
+
+
+
+    def flush(self):
+        """
+        Copy the dirty rectangle into the PhotoImage on screen
+        Only that patch is converted, so small updates stay cheap on huge boards
+        """
+        if self.dirty is None:
+            return
+        x1, y1, x2, y2 = self.dirty
+        self.dirty = None
+        patch = ImageTk.PhotoImage(self.image.crop((x1, y1, x2, y2)))
+        self.photo.tk.call(str(self.photo), "copy", str(patch), "-to", x1, y1)
+
+
+
+
+class BoardViewport(BoardImage):
+
+    # Zoom limits, in pixels per tile
+    min_tile_length = 4
+    max_tile_length = 96
+
+
+
+
+    def __init__(self, canvas, board, view_width, view_height, tile_length, margin = 8):
+        """
+        Scrollable, zoomable view of a board of any size
+        Only the visible tiles plus a margin are ever drawn; panning inside the margin
+        just moves the one canvas image, and going past it redraws that region
+        """
+        self.canvas = canvas
+        self.board = board
+        self.view_width = view_width
+        self.view_height = view_height
+        self.margin = margin
+        self.tile_length = tile_length
+        self.digit_masks = render_digits(max(int(tile_length), 1))
+        self.dirty = None
+        self.mine_colors = None
+
+
+        # Board pixel at the top left of the view, and the tile region currently drawn
+        self.scroll_x = 0
+        self.scroll_y = 0
+        self.region = (0, 0, 0, 0) # first col, first row, end col, end row
+
+        self.image_id = self.canvas.create_image(0, 0, anchor = "nw")
+        self.render()
+
+
+
+
+    def _visible_tiles(self):
+        """
+        Tiles the view currently shows, as (first col, first row, end col, end row)
+        """
+        return (
+            int(self.scroll_x // self.tile_length), int(self.scroll_y // self.tile_length),
+            min(int((self.scroll_x + self.view_width) // self.tile_length) + 1, self.board.width),
+            min(int((self.scroll_y + self.view_height) // self.tile_length) + 1, self.board.height))
+
+
+
+
+    def render(self):
+        """
+        Draw the visible tiles plus the margin into a fresh image
+        Cost depends on the view size, never on the board size
+        """
+        board = self.board
+        first_col, first_row, end_col, end_row = self._visible_tiles()
+        first_col, first_row = max(first_col - self.margin, 0), max(first_row - self.margin, 0)
+        end_col, end_row = min(end_col + self.margin, board.width), min(end_row + self.margin, board.height)
+        self.region = (first_col, first_row, end_col, end_row)
+        self.region_x = int(first_col * self.tile_length)
+        self.region_y = int(first_row * self.tile_length)
+
+
+        # Covered checkerboard first, then anything that isn't plain covered
+        cols, rows = end_col - first_col, end_row - first_row
+        self.image = self._checkerboard(cols, rows, (first_row + first_col) % 2 == 1).resize(
+            (int(end_col * self.tile_length) - self.region_x, int(end_row * self.tile_length) - self.region_y), Image.NEAREST)
+        self.draw = ImageDraw.Draw(self.image)
+        for row in range(first_row, end_row):
+            for index in range(row * board.width + first_col, row * board.width + end_col):
+                if self.mine_colors and board.mines[index]:
+                    self._draw_mine(index)
+                elif board.revealed[index] or board.flagged[index]:
+                    self.draw_tile(index)
+        self.dirty = None
+
+        self.photo = ImageTk.PhotoImage(self.image)
+        self.canvas.itemconfig(self.image_id, image = self.photo)
+        self.canvas.coords(self.image_id, self.region_x - self.scroll_x, self.region_y - self.scroll_y)
+
+
+
+
+    def scroll_to(self, x, y):
+        """
+        Put board pixel (x, y) at the top left of the view
+        """
+        max_x = max(self.board.width * self.tile_length - self.view_width, 0)
+        max_y = max(self.board.height * self.tile_length - self.view_height, 0)
+        self.scroll_x = min(max(x, 0), max_x)
+        self.scroll_y = min(max(y, 0), max_y)
+
+        first_col, first_row, end_col, end_row = self._visible_tiles()
+        region_first_col, region_first_row, region_end_col, region_end_row = self.region
+        if region_first_col <= first_col and region_first_row <= first_row and \
+                end_col <= region_end_col and end_row <= region_end_row:
+            self.canvas.coords(self.image_id, self.region_x - self.scroll_x, self.region_y - self.scroll_y)
+        else:
+            self.render()
+
+
+
+
+    def scroll_by(self, dx, dy):
+        self.scroll_to(self.scroll_x + dx, self.scroll_y + dy)
+
+
+
+
+    def zoom(self, factor, x, y):
+        """
+        Scale tiles by factor, keeping the board point under view pixel (x, y) in place
+        """
+        tile_length = min(max(self.tile_length * factor, self.min_tile_length), self.max_tile_length)
+        if tile_length == self.tile_length:
+            return
+        scale = tile_length / self.tile_length
+        self.tile_length = tile_length
+        self.digit_masks = render_digits(max(int(tile_length), 1))
+        self.region = (0, 0, 0, 0) # Force a redraw at the new size
+        self.scroll_to((self.scroll_x + x) * scale - x, (self.scroll_y + y) * scale - y)
+
+
+
+
+    def tile_at(self, x, y):
+        col = min(int((x + self.scroll_x) // self.tile_length), self.board.width - 1)
+        row = min(int((y + self.scroll_y) // self.tile_length), self.board.height - 1)
+        return row * self.board.width + col
+
+
+
+
+    def tile_box(self, index):
+        row, col = divmod(index, self.board.width)
+        return (
+            int(col * self.tile_length) - self.region_x, int(row * self.tile_length) - self.region_y,
+            int((col + 1) * self.tile_length) - self.region_x, int((row + 1) * self.tile_length) - self.region_y)
+
+
+
+
+    def _in_region(self, index):
+        row, col = divmod(index, self.board.width)
+        first_col, first_row, end_col, end_row = self.region
+        return first_col <= col < end_col and first_row <= row < end_row
+
+
+
+
+    def draw_tile(self, index):
+        """
+        Tiles outside the drawn region are skipped; render picks them up from the board later
+        """
+        if self._in_region(index):
+            BoardImage.draw_tile(self, index)
+
+
+
+
+    def reveal_mines(self, colors):
+        self._pick_mine_colors(colors)
+        self.render()
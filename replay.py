@@ -0,0 +1,141 @@
+import os
+import time
+
+from engine import make_board
+
+
+
+
+# Compact binary replays: a game is its seed plus every click, so replaying the
+# clicks on a board with the same seed reproduces it exactly
+#
+# Layout, all numbers unsigned LEB128 varints (7 bits a byte, low bits first):
+#   header: magic b"MSR1", width, height, mines, safe radius, seed, placement
+#   events: cell index, one action byte, milliseconds since the previous event
+# placement is the tile that was passed to place_mines, usually the first click
+# (no-guess layouts are placed from a nearby tile instead)
+
+MAGIC = b"MSR1"
+REVEAL = 0
+FLAG = 1
+CHORD = 2
+REPLAY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "replays")
+
+
+
+
+def write_varint(buffer, value):
+    while value > 0x7f:
+        buffer.append(value & 0x7f | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+
+
+def read_varint(data, position):
+    """
+    Returns (value, position after it)
+    """
+    value = shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+
+
+class Recorder(object):
+    def __init__(self, width, height, mine_number, seed, placement, safe_radius = 1):
+        """
+        Appends every action of one game to an in-memory log as it happens
+        """
+        self.data = bytearray(MAGIC)
+        for value in (width, height, mine_number, safe_radius, seed, placement):
+            write_varint(self.data, value)
+        self.last_time = time.monotonic()
+
+
+
+
+    def record(self, index, action):
+        now = time.monotonic()
+        write_varint(self.data, index)
+        self.data.append(action)
+        write_varint(self.data, int((now - self.last_time) * 1000))
+        self.last_time = now
+
+
+
+
+    def save(self, replay_dir = REPLAY_DIR):
+        """
+        Write the log to its own file in replay_dir; returns the path
+        """
+        os.makedirs(replay_dir, exist_ok = True)
+        path = os.path.join(replay_dir, "%s-%d.msr" % (time.strftime("%Y%m%d-%H%M%S"), id(self)))
+        with open(path, "wb") as replay_file:
+            replay_file.write(self.data)
+        return path
+
+
+
+
+class Replay(object):
+    def __init__(self, data):
+        """
+        Parsed replay log; events is a list of (index, action, milliseconds)
+        """
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError("Not a replay file")
+        position = len(MAGIC)
+        header = []
+        for field in range(6):
+            value, position = read_varint(data, position)
+            header.append(value)
+        self.width, self.height, self.mine_number, self.safe_radius, self.seed, self.placement = header
+
+        self.events = []
+        while position < len(data):
+            index, position = read_varint(data, position)
+            action = data[position]
+            delay, position = read_varint(data, position + 1)
+            self.events.append((index, action, delay))
+
+
+
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as replay_file:
+            return cls(replay_file.read())
+
+
+
+
+    def play(self, engine = "array"):
+        """
+        Re-run the game headlessly; returns the board as the last event left it
+        Stops early if a reveal hits a mine, like the game does
+        """
+        board = make_board(self.width, self.height, self.mine_number, engine,
+            safe_radius = self.safe_radius, seed = self.seed)
+        board.place_mines(self.placement)
+        for index, action, delay in self.events:
+            if action == REVEAL:
+                board.reveal(index)
+                if board.lost:
+                    break
+            elif action == FLAG:
+                board.toggle_flag(index)
+            elif action == CHORD:
+                board.chord(index)
+                if board.lost:
+                    break
+            else:
+                raise ValueError("Unknown replay action %d" % action)
+        return board
@@ -0,0 +1,117 @@
+import time
+
+import perf
+
+
+
+
+# Runs animations and timers on the Tk main thread through root.after
+# Tkinter isn't thread safe, so nothing else should touch the canvas
+#
+# A task is a generator; whatever it yields is how many seconds to wait before
+# resuming it (0 means next frame), so "time.sleep(x)" in old thread code
+# becomes "yield x"
+
+
+
+
+class Scheduler(object):
+    def __init__(self, root, fps = 60, budget = 0.5):
+        """
+        budget is the fraction of each frame tasks may use before the rest wait a frame
+        """
+        self.root = root
+        self.frame = 1 / fps
+        self.budget = self.frame * budget
+
+
+        # handle -> [due time, generator]; times come from time.monotonic
+        self.tasks = {}
+        self.next_handle = 1
+        self.after_id = None
+
+
+
+
+    def start(self, task, delay = 0):
+        """
+        Schedule a generator; returns a handle for cancel
+        """
+        handle = self.next_handle
+        self.next_handle += 1
+        self.tasks[handle] = [time.monotonic() + delay, task]
+        self._wake()
+        return handle
+
+
+
+
+    def cancel(self, handle):
+        """
+        Stop a task; unknown or finished handles are ignored
+        """
+        self.tasks.pop(handle, None)
+
+
+
+
+    def cancel_all(self):
+        for handle in list(self.tasks):
+            self.cancel(handle)
+
+
+
+
+    def is_running(self, handle):
+        return handle in self.tasks
+
+
+
+
+    def _wake(self, delay = 0):
+        """
+        Make sure a tick is coming, no later than delay seconds from now
+        """
+        if self.after_id is not None:
+            self.root.after_cancel(self.after_id)
+        self.after_id = self.root.after(max(int(delay * 1000), 1), self._tick)
+
+
+
+
+    def _tick(self):
+        """
+        Resume every due task, oldest due first, until the frame budget runs out
+        """
+        self.after_id = None
+        tick_start = time.monotonic()
+        started = perf.start()
+
+        due = sorted((task[0], handle) for handle, task in self.tasks.items() if task[0] <= tick_start)
+        for due_time, handle in due:
+            if time.monotonic() - tick_start > self.budget:
+                break
+            task = self.tasks.get(handle)
+            if task is None: # Cancelled by an earlier task this tick
+                continue
+            try:
+                delay = next(task[1]) or 0
+            except StopIteration:
+                self.tasks.pop(handle, None)
+                continue
+
+            # Next step is timed from when this one was due, so repeating tasks
+            # don't drift; one that fell behind restarts from now instead
+            task[0] = due_time + delay
+            if task[0] < tick_start:
+                task[0] = tick_start + delay
+
+
+        perf.stop("frame", started)
+
+
+        # Sleep until the next task is due, but never run two ticks in one frame
+        if self.tasks:
+            next_due = min(task[0] for task in self.tasks.values())
+            now = time.monotonic()
+            self._wake(max(next_due - now, tick_start + self.frame - now))
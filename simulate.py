@@ -0,0 +1,97 @@
+import argparse
+import multiprocessing
+import random as r
+import time
+
+from engine import PRESETS, choose_engine, fitting_safe_radius, make_board, parse_size, three_bv
+from solver import Solver
+
+
+
+
+# Plays lots of headless games with the solver (guessing when it has to) to
+# see how hard each board size is: python3 simulate.py Hard --games 1000000
+# Games are split into batches spread over a process pool; each batch seeds
+# its own random stream from (seed, batch number), so results don't depend
+# on how many workers ran them or in what order
+
+
+
+
+def play_batch(job):
+    """
+    Play one batch of games in a worker; returns summed stats, not per game ones,
+    so sending results back costs the same however big the batch is
+    """
+    width, height, mine_number, engine, seed, batch, games = job
+    r.seed(seed * 1000003 + batch)
+    stats = {"games": games, "wins": 0, "3bv": 0, "moves": 0, "guesses": 0}
+    for game in range(games):
+        board = make_board(width, height, mine_number, engine)
+        first_index = r.randrange(board.size)
+        board.safe_radius = fitting_safe_radius(width, height, mine_number, first_index, board.safe_radius)
+        board.place_mines(first_index)
+        solver = Solver(board)
+        stats["wins"] += solver.play(first_index)
+        stats["3bv"] += three_bv(board)
+        stats["moves"] += solver.moves + solver.guesses + 1
+        stats["guesses"] += solver.guesses
+    return stats
+
+
+
+
+def simulate(width, height, mine_number, games, workers = None, batch_size = 500, engine = "array", seed = 0):
+    """
+    Play games across workers processes (None uses every core); returns summed stats
+    plus the wall clock seconds it took
+    """
+    jobs = []
+    for batch, first_game in enumerate(range(0, games, batch_size)):
+        jobs.append((width, height, mine_number, engine, seed, batch, min(batch_size, games - first_game)))
+
+    totals = {"games": 0, "wins": 0, "3bv": 0, "moves": 0, "guesses": 0}
+    start = time.perf_counter()
+    with multiprocessing.Pool(workers) as pool:
+        for stats in pool.imap_unordered(play_batch, jobs):
+            for key in totals:
+                totals[key] += stats[key]
+    totals["seconds"] = time.perf_counter() - start
+    return totals
+
+
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Play headless Minesweeper games with the solver")
+    parser.add_argument("size", nargs = "*", default = ["Hard"],
+        help = "a difficulty (%s) or width height mines" % ", ".join(PRESETS))
+    parser.add_argument("--games", type = int, default = 10000)
+    parser.add_argument("--workers", type = int, default = None, help = "processes to use (default: every core)")
+    parser.add_argument("--batch-size", type = int, default = 500)
+    parser.add_argument("--engine", choices = ["array", "bitboard"], default = "array")
+    parser.add_argument("--seed", type = int, default = 0)
+    args = parser.parse_args(argv)
+
+    try:
+        width, height, mine_number = parse_size(args.size)
+        choose_engine(width, height, mine_number, args.engine, switch = False)
+    except ValueError as error:
+        parser.error(str(error))
+    if args.games < 1:
+        parser.error("--games must be at least 1")
+
+    totals = simulate(width, height, mine_number, args.games, args.workers, args.batch_size, args.engine, args.seed)
+    games = totals["games"]
+    print("%dx%d, %d mines, %d games on %d workers" % (
+        width, height, mine_number, games, args.workers or multiprocessing.cpu_count()))
+    print("  win rate:    %.2f%%" % (totals["wins"] / games * 100))
+    print("  3BV:         %.2f" % (totals["3bv"] / games))
+    print("  game length: %.2f moves (%.2f guesses)" % (totals["moves"] / games, totals["guesses"] / games))
+    print("  speed:       %.0f games/s" % (games / totals["seconds"]))
+
+
+
+
+if __name__ == "__main__":
+    main()
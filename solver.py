@@ -0,0 +1,296 @@
+import random as r
+
+
+
+
+# Deterministic Minesweeper solver that plays a headless board (engine.Board or
+# bitboard.BitBoard) using only what a player can see: revealed numbers
+#
+# Each move tries cheaper rules first and stops at the first that finds anything
+#   1. single tile: a number whose unknown neighbours are all mines or all safe
+#   2. pairs: two overlapping numbers, e.g. one's unknowns are a subset of the other's
+#   3. mine count: no mines left means every unknown tile is safe
+#   4. enumeration: every mine layout of each connected frontier group, keeping
+#      tiles that are a mine in all of them or in none
+
+
+
+
+class Solver(object):
+    def __init__(self, board, max_component = 24):
+        """
+        max_component caps how many tiles enumeration will try layouts for at once
+        """
+        self.board = board
+        self.max_component = max_component
+        self.mines = set() # Tiles proven to be mines
+        self.frontier = set() # Revealed numbered tiles that still touch unknown tiles
+        self.moves = 0
+        self.guesses = 0
+
+
+
+
+    def solve(self, first_index = None):
+        """
+        Play until the board is won or no rule applies; True if won without guessing
+        first_index is the opening click, which places the mines on a fresh board
+        """
+        board = self.board
+        if first_index is not None:
+            if not board.mines_placed:
+                board.place_mines(first_index)
+            self.reveal(first_index)
+
+        while not board.is_won():
+            if board.lost: # A losing first_index, or a wrong rule
+                return False
+            safe, mines = self.deduce()
+            if not safe and not mines:
+                return False
+            self.mines |= mines
+            for index in safe:
+                self.reveal(index)
+            self.moves += 1
+        return True
+
+
+
+
+    def play(self, first_index, rng = r):
+        """
+        Like solve, but guesses a random unknown tile whenever no rule applies
+        Returns True if the game was won, False if a guess hit a mine
+        """
+        while not self.solve(first_index):
+            if self.board.lost:
+                return False
+            first_index = rng.choice(self.unknown_tiles())
+            self.guesses += 1
+        return True
+
+
+
+
+    def unknown_tiles(self):
+        """
+        Covered tiles not proven to be mines
+        """
+        revealed = self.board.revealed
+        return [index for index in range(self.board.size) if not revealed[index] and index not in self.mines]
+
+
+
+
+    def reveal(self, index):
+        """
+        Reveal a tile on the board and add any new numbers to the frontier
+        Returns the cleared tiles like board.reveal
+        """
+        mines_near = self.board.mines_near
+        cleared = self.board.reveal(index)
+        for tile in cleared:
+            if mines_near[tile] > 0:
+                self.frontier.add(tile)
+        return cleared
+
+
+
+
+    def constraints(self):
+        """
+        (unknown neighbours, mines among them) for every frontier tile
+        Tiles with nothing unknown left drop off the frontier
+        """
+        board = self.board
+        revealed = board.revealed
+        mines_near = board.mines_near
+        known_mines = self.mines
+
+        constraints = []
+        finished = []
+        for tile in self.frontier:
+            mines = mines_near[tile]
+            unknown = []
+            for neighbor in board.get_neighbors(tile):
+                if neighbor in known_mines:
+                    mines -= 1
+                elif not revealed[neighbor]:
+                    unknown.append(neighbor)
+            if unknown:
+                constraints.append((frozenset(unknown), mines))
+            else:
+                finished.append(tile)
+        self.frontier.difference_update(finished)
+        return constraints
+
+
+
+
+    def deduce(self):
+        """
+        Sets of tiles that are certainly safe and certainly mines; both empty means a guess is needed
+        """
+        constraints = self.constraints()
+        safe, mines = self._single_tile(constraints)
+        if not safe and not mines:
+            safe, mines = self._pairs(constraints)
+        if not safe and not mines:
+            safe = self._mine_count()
+        if not safe and not mines:
+            safe, mines = self._enumerate(constraints)
+        return safe, mines
+
+
+
+
+    def _single_tile(self, constraints):
+        safe, mines = set(), set()
+        for cells, count in constraints:
+            if count == 0:
+                safe |= cells
+            elif count == len(cells):
+                mines |= cells
+        return safe, mines
+
+
+
+
+    def _pairs(self, constraints):
+        """
+        For overlapping constraints A and B, B's tiles outside A hold at least
+        count_b - count_a mines and at most count_b - (count_a - |A outside B|)
+        When either bound is tight, both sides are decided
+        """
+        safe, mines = set(), set()
+        by_tile = {}
+        for number, (cells, count) in enumerate(constraints):
+            for cell in cells:
+                by_tile.setdefault(cell, []).append(number)
+
+        for number, (cells_a, count_a) in enumerate(constraints):
+            checked = {number}
+            for cell in cells_a:
+                for other in by_tile[cell]:
+                    if other in checked:
+                        continue
+                    checked.add(other)
+                    cells_b, count_b = constraints[other]
+                    only_a = cells_a - cells_b
+                    only_b = cells_b - cells_a
+                    if only_b and count_b - count_a == len(only_b):
+                        mines |= only_b
+                        safe |= only_a
+                    elif only_b and count_b - count_a + len(only_a) == 0:
+                        safe |= only_b
+        return safe, mines
+
+
+
+
+    def _mine_count(self):
+        """
+        Once every mine is known, every other covered tile is safe
+        """
+        if len(self.mines) != self.board.mine_number:
+            return set()
+        return set(self.unknown_tiles())
+
+
+
+
+    def _components(self, constraints):
+        """
+        Split constraints into groups that share no tiles
+        """
+        by_tile = {}
+        for number, (cells, count) in enumerate(constraints):
+            for cell in cells:
+                by_tile.setdefault(cell, []).append(number)
+
+        seen = set()
+        components = []
+        for start in range(len(constraints)):
+            if start in seen:
+                continue
+            seen.add(start)
+            group = [start]
+            for number in group: # Grows while iterating
+                for cell in constraints[number][0]:
+                    for other in by_tile[cell]:
+                        if other not in seen:
+                            seen.add(other)
+                            group.append(other)
+            components.append([constraints[number] for number in group])
+        return components
+
+
+
+
+    def _enumerate(self, constraints):
+        """
+        Try every mine layout of each frontier group small enough to enumerate
+        """
+        safe, mines = set(), set()
+        for component in self._components(constraints):
+            # Tiles in the order the constraints reach them, so checks fail early
+            tiles = []
+            for cells, count in component:
+                tiles.extend(sorted(cells - set(tiles)))
+            if len(tiles) > self.max_component:
+                continue
+
+            position = {tile: number for number, tile in enumerate(tiles)}
+            checks = [([position[cell] for cell in cells], count) for cells, count in component]
+            mine_counts = [0] * len(tiles)
+            layouts = _count_layouts(len(tiles), checks, mine_counts)
+            if layouts:
+                for tile, count in zip(tiles, mine_counts):
+                    if count == 0:
+                        safe.add(tile)
+                    elif count == layouts:
+                        mines.add(tile)
+        return safe, mines
+
+
+
+
+def _count_layouts(tile_number, checks, mine_counts):
+    """
+    Count mine layouts of tile_number tiles that satisfy every (tiles, mines) check
+    mine_counts[i] collects how many of those layouts put a mine on tile i
+    """
+    layout = [0] * tile_number
+    placed = [0] * len(checks) # Mines so far per check
+    left = [len(cells) for cells, count in checks] # Unset tiles per check
+    tile_checks = [[] for tile in range(tile_number)]
+    for number, (cells, count) in enumerate(checks):
+        for cell in cells:
+            tile_checks[cell].append(number)
+
+
+    def place(tile):
+        if tile == tile_number:
+            for index in range(tile_number):
+                mine_counts[index] += layout[index]
+            return 1
+
+        layouts = 0
+        for value in (0, 1):
+            layout[tile] = value
+            valid = True
+            for number in tile_checks[tile]:
+                placed[number] += value
+                left[number] -= 1
+                count = checks[number][1]
+                if placed[number] > count or placed[number] + left[number] < count:
+                    valid = False
+            if valid:
+                layouts += place(tile + 1)
+            for number in tile_checks[tile]:
+                placed[number] -= value
+                left[number] += 1
+        layout[tile] = 0
+        return layouts
+
+    return place(0)